@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+class ConnectionHealthMiddleware:
+    """
+    Проверка постоянных соединений с базой (CONN_MAX_AGE > 0) перед
+    запросом, аналог CONN_HEALTH_CHECKS из Django 4.1. Соединение,
+    простоявшее без запросов дольше DB_HEALTH_CHECK_IDLE секунд,
+    проверяется через is_usable() (SELECT 1) и при обрыве (рестарт
+    базы или pgbouncer) закрывается: запрос откроет новое вместо ошибки.
+    Включается DB_HEALTH_CHECKS.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DB_HEALTH_CHECKS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        now = time.monotonic()
+        for connection in connections.all():
+            idle = now - getattr(connection, 'last_request_at', now)
+            if (connection.connection is not None
+                    and idle >= settings.DB_HEALTH_CHECK_IDLE
+                    and not connection.is_usable()):
+                connection.close()
+        try:
+            return self.get_response(request)
+        finally:
+            now = time.monotonic()
+            for connection in connections.all():
+                connection.last_request_at = now
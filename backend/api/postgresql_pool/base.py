@@ -0,0 +1,88 @@
+from threading import BoundedSemaphore, Lock
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+from psycopg2 import OperationalError, pool
+
+pools = {}
+pools_lock = Lock()
+
+
+class ConnectionPool(pool.ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool, который открывает соединения функцией
+    connect, а не psycopg2.connect, и не выдаёт больше maxconn
+    соединений: лишний поток ждёт свободное в slots.
+    """
+
+    def __init__(self, minconn, maxconn, connect):
+        self.connect = connect
+        self.slots = BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn)
+
+    def _connect(self, key=None):
+        conn = self.connect()
+        if key is not None:
+            self._used[key] = conn
+            self._rused[id(conn)] = key
+        else:
+            self._pool.append(conn)
+        return conn
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL с пулом соединений в процессе (psycopg2
+    ThreadedConnectionPool, от DB_POOL_MIN_SIZE до DB_POOL_MAX_SIZE).
+    Django закрывает соединение в конце запроса, а этот бэкенд вместо
+    закрытия возвращает его в пул: потоки gthread-воркера делят
+    несколько открытых соединений, как с pgbouncer. Новые соединения
+    открывает get_new_connection родителя со всей его настройкой.
+    Если все соединения заняты, поток ждёт до DB_POOL_TIMEOUT секунд.
+    """
+
+    def get_pool(self, conn_params):
+        with pools_lock:
+            if self.alias not in pools:
+                pools[self.alias] = ConnectionPool(
+                    settings.DB_POOL_MIN_SIZE, settings.DB_POOL_MAX_SIZE,
+                    lambda: super(DatabaseWrapper, self).get_new_connection(
+                        conn_params))
+            return pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        connections = self.get_pool(conn_params)
+        if not connections.slots.acquire(timeout=settings.DB_POOL_TIMEOUT):
+            raise OperationalError(
+                f'Нет свободных соединений в пуле {self.alias} за '
+                f'{settings.DB_POOL_TIMEOUT} с: увеличьте DB_POOL_MAX_SIZE.')
+        try:
+            connection = connections.getconn()
+            while connection.closed:
+                connections.putconn(connection, close=True)
+                connection = connections.getconn()
+        except Exception:
+            connections.slots.release()
+            raise
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connections = pools[self.alias]
+        try:
+            with self.wrap_database_errors:
+                # Незавершённую транзакцию пул откатит, оборванное
+                # соединение - закроет.
+                connections.putconn(
+                    self.connection, close=bool(self.connection.closed))
+        finally:
+            connections.slots.release()
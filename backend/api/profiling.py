@@ -0,0 +1,206 @@
+import logging
+import os
+import re
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from threading import Lock
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+# Списки IN (%s, %s, ...) разной длины - один и тот же запрос.
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+METRICS = ('total_ms', 'db_ms', 'queries', 'duplicates', 'python_ms',
+           'render_ms')
+PERCENTILES = (50, 95, 99)
+TOP_DUPLICATES = 5
+
+
+def fingerprint(sql):
+    return IN_LIST.sub('IN (...)', sql)
+
+
+def percentile(values, rank):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, len(ordered) * rank // 100)]
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: число, время и отпечатки SQL-запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return {
+            sql: count for sql, count in self.fingerprints.items()
+            if count > 1
+        }
+
+
+class ProfilingStats:
+    """
+    Последние PROFILING_SAMPLE_SIZE замеров каждого представления
+    в памяти процесса: у каждого воркера своя сводка.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.samples = defaultdict(
+                lambda: deque(maxlen=settings.PROFILING_SAMPLE_SIZE))
+            self.duplicates = defaultdict(Counter)
+
+    def add(self, endpoint, sample, duplicates):
+        with self.lock:
+            self.samples[endpoint].append(sample)
+            self.duplicates[endpoint].update(duplicates)
+
+    def report(self):
+        with self.lock:
+            samples = {key: list(value) for key, value in self.samples.items()}
+            duplicates = {
+                key: value.most_common(TOP_DUPLICATES)
+                for key, value in self.duplicates.items()
+            }
+        report = []
+        for endpoint, rows in samples.items():
+            item = {'endpoint': endpoint, 'count': len(rows)}
+            for metric in METRICS:
+                values = [row[metric] for row in rows]
+                item[metric] = {
+                    f'p{rank}': round(percentile(values, rank), 2)
+                    for rank in PERCENTILES
+                }
+            item['top_duplicates'] = [
+                {'sql': sql, 'count': count}
+                for sql, count in duplicates.get(endpoint, [])
+            ]
+            report.append(item)
+        return sorted(
+            report, key=lambda item: item['total_ms']['p95'], reverse=True)
+
+
+stats = ProfilingStats()
+
+
+def endpoint_name(view_func, request):
+    """RecipeViewSet.list, SubscribeListView или имя функции."""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    if action:
+        return f'{view_class.__name__}.{action}'
+    return view_class.__name__
+
+
+class ProfilingMiddleware:
+    """
+    Замеры запросов к представлениям: SQL (число, время, повторы
+    одинаковых запросов - признак N+1), время Python в представлении
+    без учёта базы (в основном сериализация) и время рендеринга ответа.
+    Включается PROFILING_ENABLED, запросы дольше PROFILING_SLOW_MS
+    пишутся в лог, сводка p50/p95/p99 - ProfilingView.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.profiling = None
+        start = time.perf_counter()
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        if request.profiling is not None:
+            self.record(request, response, recorder, start)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.profiling = {
+            'endpoint': endpoint_name(view_func, request),
+            'render_ms': 0.0,
+        }
+
+    def process_template_response(self, request, response):
+        if request.profiling is None:
+            return response
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.profiling['render_ms'] = (
+                time.perf_counter() - started) * 1000
+
+        request.profiling['view_end'] = started
+        response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, recorder, start):
+        profiling = request.profiling
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = recorder.duration * 1000
+        view_end = profiling.get('view_end', time.perf_counter())
+        duplicates = recorder.duplicates()
+        sample = {
+            'total_ms': total_ms,
+            'db_ms': db_ms,
+            'queries': recorder.count,
+            'duplicates': sum(duplicates.values()) - len(duplicates),
+            'python_ms': max((view_end - start) * 1000 - db_ms, 0.0),
+            'render_ms': profiling['render_ms'],
+        }
+        stats.add(profiling['endpoint'], sample, duplicates)
+        if total_ms >= settings.PROFILING_SLOW_MS:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, SQL %d за %.0f мс, '
+                'повторов %d, Python %.0f мс, рендеринг %.0f мс',
+                request.method, request.get_full_path(),
+                profiling['endpoint'], total_ms, recorder.count, db_ms,
+                sample['duplicates'], sample['python_ms'],
+                sample['render_ms'])
+
+
+class ProfilingView(APIView):
+    """Сводка замеров ProfilingMiddleware текущего процесса."""
+
+    permission_classes = [IsAdminUser, ]
+
+    def get(self, request):
+        return Response({
+            'enabled': settings.PROFILING_ENABLED,
+            'pid': os.getpid(),
+            'endpoints': stats.report(),
+        })
+
+    def delete(self, request):
+        stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
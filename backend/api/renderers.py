@@ -0,0 +1,75 @@
+import json
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def orjson_dumps(data, default):
+    return orjson.dumps(
+        data, default=default,
+        option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+def ujson_dumps(data, default):
+    # default поддерживается с ujson 5.2.
+    return ujson.dumps(
+        data, ensure_ascii=False, escape_forward_slashes=False,
+        default=default).encode('utf-8')
+
+
+def json_dumps(data, default):
+    return json.dumps(
+        data, ensure_ascii=False, separators=(',', ':'),
+        default=default).encode('utf-8')
+
+
+DUMPS = {
+    'orjson': (orjson, orjson_dumps),
+    'ujson': (ujson, ujson_dumps),
+    'json': (json, json_dumps),
+}
+
+
+def get_dumps(backends):
+    """Первая установленная библиотека из backends, иначе json."""
+    for backend in backends:
+        module, dumps = DUMPS[backend]
+        if module is not None:
+            return backend, dumps
+    return 'json', json_dumps
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON сразу в UTF-8 без экранирования кириллицы через orjson или
+    ujson, если они установлены, иначе через json. Даты и время
+    orjson сериализует сам, остальные типы (Decimal, ленивые строки
+    переводов, UUID) - JSONEncoder DRF, как стандартный рендерер.
+    Ответы с отступами (?indent, браузерный API) рендерит JSONRenderer.
+    """
+
+    ensure_ascii = False
+
+    def __init__(self):
+        self.backend, self.dumps = get_dumps(
+            settings.JSON_RENDERER_BACKENDS)
+        self.default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        return self.dumps(data, self.default)
@@ -1,6 +1,8 @@
 import mimetypes
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # from dotenv import load_dotenv
 
 # load_dotenv()
@@ -33,6 +35,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.ProfilingMiddleware',
+    'api.connections.ConnectionHealthMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -112,7 +116,103 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# Автодополнение Продуктов: 'db' - индексы PostgreSQL,
+# 'memory' - отсортированный массив в памяти процесса.
+INGREDIENT_AUTOCOMPLETE_INDEX = os.getenv(
+    'INGREDIENT_AUTOCOMPLETE_INDEX', default='db')
+INGREDIENT_AUTOCOMPLETE_LIMIT = int(os.getenv(
+    'INGREDIENT_AUTOCOMPLETE_LIMIT', default=20))
+
+# Общий кэш нужен, чтобы сигналы одного процесса сбрасывали
+# кэш справочников во всех остальных (например, memcached).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+# Кэш Тэгов и Продуктов: время жизни в общем кэше (оно же ограничивает
+# устаревание при локальном кэше) и размер LRU в памяти процесса.
+REFERENCE_CACHE_TIMEOUT = int(os.getenv(
+    'REFERENCE_CACHE_TIMEOUT', default=300))
+REFERENCE_CACHE_LOCAL_SIZE = 4
+
+# Проверка постоянных соединений с базой перед запросом (включена
+# в api.settings_production): соединение, простоявшее без запросов
+# столько секунд, проверяется SELECT 1.
+DB_HEALTH_CHECKS = os.getenv('DB_HEALTH_CHECKS') == 'True'
+DB_HEALTH_CHECK_IDLE = int(os.getenv('DB_HEALTH_CHECK_IDLE', default=30))
+
+# Кэш ответов списка и страниц Рецептов и пользователей для анонимов:
+# время жизни (0 - выключен), сколько секунд остальные запросы ждут
+# пересборки истёкшего ключа одним запросом и как часто проверяют кэш.
+# Версию контента сдвигают сигналы в процессе, который менял данные,
+# поэтому при нескольких воркерах нужен общий кэш (CACHE_BACKEND).
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=60))
+RESPONSE_CACHE_LOCK_TIMEOUT = 5
+RESPONSE_CACHE_POLL_INTERVAL = 0.05
+
+# Сколько секунд в общем кэше живут множества id Избранного, Покупок и
+# Подписок пользователя. Представления отметок сбрасывают их сразу,
+# срок ограничивает устаревание после правок в обход API (админка).
+VIEWER_STATE_TIMEOUT = int(os.getenv('VIEWER_STATE_TIMEOUT', default=60))
+
+# Сколько секунд живёт закэшированный COUNT для постраничного вывода по ключу.
+PAGINATION_COUNT_TIMEOUT = int(os.getenv(
+    'PAGINATION_COUNT_TIMEOUT', default=60))
+
+# Массовое добавление/ удаление Избранного, Покупок и Подписок:
+# сколько id можно передать одним запросом.
+BULK_MAX_IDS = 100
+
+# Лента подписок: сколько последних id Рецептов держать в кэше на
+# пользователя и сколько секунд (новые Рецепты сбрасывают её сигналом).
+FEED_TIMELINE_SIZE = int(os.getenv('FEED_TIMELINE_SIZE', default=500))
+FEED_TIMELINE_TIMEOUT = int(os.getenv('FEED_TIMELINE_TIMEOUT', default=300))
+
+# Уменьшенные копии изображений Рецептов (WebP и JPEG): размеры, качество
+# и число потоков пула; при 0 копии строятся прямо в запросе.
+IMAGE_RENDITIONS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+}
+IMAGE_RENDITION_QUALITY = 80
+IMAGE_RENDITION_WORKERS = int(os.getenv(
+    'IMAGE_RENDITION_WORKERS', default=2))
+
+# Профилирование запросов (api.profiling): число и время SQL, повторы
+# запросов, время сериализации. Запросы дольше PROFILING_SLOW_MS пишутся
+# в лог, сводка p50/p95/p99 по последним PROFILING_SAMPLE_SIZE замерам
+# каждого представления - /api/profiling/ (только персонал).
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', default='') == 'True'
+PROFILING_SLOW_MS = int(os.getenv('PROFILING_SLOW_MS', default=500))
+PROFILING_SAMPLE_SIZE = 1000
+
+# Подбор Рецептов по продуктам в наличии (/api/recipes/cook/): как часто
+# можно перестраивать обратный индекс, сколько продуктов в запросе и
+# Рецептов в ответе.
+COOK_INDEX_MAX_AGE = int(os.getenv('COOK_INDEX_MAX_AGE', default=60))
+COOK_MAX_INGREDIENTS = 50
+COOK_RESULTS_LIMIT = 500
+
+# Период полураспада балла ?ordering=trending (команда refresh_scores).
+TRENDING_HALF_LIFE_HOURS = float(os.getenv(
+    'TRENDING_HALF_LIFE_HOURS', default=72))
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
@@ -122,6 +222,23 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Библиотеки JSON для api.renderers.FastJSONRenderer в порядке
+# предпочтения: берётся первая установленная, json есть всегда.
+# Опечатка в названии останавливает запуск, а не каждый ответ.
+JSON_RENDERER_BACKENDS = tuple(
+    backend.strip()
+    for backend in os.getenv(
+        'JSON_RENDERER_BACKENDS', default='orjson,ujson,json').split(',')
+    if backend.strip()
+)
+UNKNOWN_JSON_RENDERER_BACKENDS = set(JSON_RENDERER_BACKENDS) - {
+    'orjson', 'ujson', 'json'}
+if UNKNOWN_JSON_RENDERER_BACKENDS:
+    raise ImproperlyConfigured(
+        'JSON_RENDERER_BACKENDS: неизвестные библиотеки '
+        f'{", ".join(sorted(UNKNOWN_JSON_RENDERER_BACKENDS))}, '
+        'допустимы orjson, ujson и json.')
+
 AUTH_USER_MODEL = 'users.User'
 
 DJOSER = {
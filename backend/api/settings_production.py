@@ -0,0 +1,63 @@
+"""
+Настройки для продакшена (gunicorn в Docker, см. gunicorn.conf.py).
+Соединения с базой постоянные и проверяются перед запросом, DB_POOL
+включает пул соединений в процессе, DB_PGBOUNCER - работу через
+pgbouncer в режиме pool_mode=transaction. Кэш - общий для всех
+воркеров (memcached), кэш в памяти процесса не допускается.
+Использование: DJANGO_SETTINGS_MODULE=api.settings_production
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, DATABASES, IMAGE_RENDITION_WORKERS
+
+DEBUG = False
+
+# Версии контента, справочников и отметок пользователя, кэш ответов и
+# блокировки их пересборки должны быть видны всем воркерам gunicorn:
+# с кэшем в памяти процесса другие воркеры отдают устаревшие данные.
+CACHES['default'].update({
+    'BACKEND': os.getenv(
+        'CACHE_BACKEND',
+        default='django.core.cache.backends.memcached.MemcachedCache'),
+    'LOCATION': os.getenv('CACHE_LOCATION', default='memcached:11211'),
+})
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+if CACHES['default']['BACKEND'] in LOCAL_CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f'CACHE_BACKEND={CACHES["default"]["BACKEND"]} не общий для '
+        'воркеров: укажите memcached или redis в CACHE_BACKEND и '
+        'CACHE_LOCATION.')
+
+# Соединение потока с базой переиспользуется следующими запросами
+# столько секунд, а не открывается заново на каждый запрос.
+DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv(
+    'DB_CONN_MAX_AGE', default=60))
+
+DB_HEALTH_CHECKS = os.getenv('DB_HEALTH_CHECKS', default='True') == 'True'
+
+# Пул на процесс: соединение возвращается в пул в конце запроса, поэтому
+# CONN_MAX_AGE не нужен. Размер пула по умолчанию - потоки воркера,
+# потоки копий изображений и поток пересборки индекса продуктов; когда
+# пул занят, поток ждёт соединение до DB_POOL_TIMEOUT секунд.
+if os.getenv('DB_POOL') == 'True':
+    DATABASES['default'].update({
+        'ENGINE': 'api.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+    })
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', default=1))
+DB_POOL_MAX_SIZE = int(os.getenv(
+    'DB_POOL_MAX_SIZE',
+    default=int(os.getenv('GUNICORN_THREADS', default=4))
+    + IMAGE_RENDITION_WORKERS + 1))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', default=10))
+
+# pgbouncer в режиме транзакций не сохраняет курсоры между ними:
+# .iterator() работает без курсоров на сервере.
+if os.getenv('DB_PGBOUNCER') == 'True':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
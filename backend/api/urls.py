@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from .profiling import ProfilingView
+
 urlpatterns = [
     path('admin/', admin.site.urls, name='admin'),
     path('api/', include([
+        path('profiling/', ProfilingView.as_view(), name='profiling'),
         path('', include('recipes.urls')),
         path('', include('users.urls')),
     ]))
@@ -0,0 +1,37 @@
+"""
+Настройки gunicorn, читаются из рабочего каталога автоматически.
+Модель воркеров - GUNICORN_WORKER_CLASS: gthread (по умолчанию, потоки
+с постоянными соединениями с базой) или gevent (нужны пакеты gevent и
+psycogreen). Число процессов по умолчанию - 2 * CPU + 1, где CPU -
+доступные процессу ядра (с учётом ограничений контейнера по cpuset).
+"""
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', default='gthread')
+
+
+def cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', default=cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', default=4))
+worker_connections = int(os.getenv(
+    'GUNICORN_WORKER_CONNECTIONS', default=100))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', default=30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', default=5))
+# Перезапуск воркера после стольких запросов ограничивает рост памяти.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', default=1000))
+max_requests_jitter = max_requests // 10
+
+
+def post_fork(server, worker):
+    if worker_class != 'gevent':
+        return
+    # Без патча psycopg2 блокирует весь процесс на время запроса к базе.
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
@@ -36,7 +36,7 @@ class TagAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     """Администрирование Рецептов."""
 
-    list_display = ('pk', 'name', 'author')
+    list_display = ('pk', 'name', 'author', 'favorites_count')
     search_fields = ('name', 'author', 'tags')
     list_filter = ('author', 'tags')
     empty_value_display = '-пусто-'
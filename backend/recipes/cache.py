@@ -0,0 +1,233 @@
+import hashlib
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from users.models import Subscribe
+
+from .models import Favorite, Ingredient, Shopping, Tag
+
+Reference = namedtuple('Reference', ('version', 'objects', 'by_id', 'data'))
+
+
+def get_version(key, timeout):
+    """
+    Версия данных под ключом key: отметка времени в мс. Если ключа
+    в кэше нет, версией становится текущее время.
+    """
+    version = cache.get(key)
+    if version is not None:
+        return version
+    cache.add(key, int(time.time() * 1000), timeout)
+    return cache.get(key, int(time.time() * 1000))
+
+
+def bump_version(key, timeout):
+    version = max(int(time.time() * 1000), get_version(key, timeout) + 1)
+    cache.set(key, version, timeout)
+
+
+def viewer_version_key(user_id):
+    return f'viewer:{user_id}:version'
+
+
+def viewer_version(user):
+    """
+    Версия отметок пользователя (Избранное, Покупки, Подписки): входит
+    в ETag Рецептов, сдвигается при любом их изменении.
+    """
+    if user.is_anonymous:
+        return 0
+    return get_version(
+        viewer_version_key(user.id), settings.REFERENCE_CACHE_TIMEOUT)
+
+
+def bump_viewer_version(user_id):
+    bump_version(viewer_version_key(user_id), settings.REFERENCE_CACHE_TIMEOUT)
+
+
+CONTENT_VERSION_KEY = 'content:version'
+
+
+def content_version():
+    """
+    Версия общего контента (Рецепты, Тэги, Продукты, пользователи):
+    входит в ключи кэша ответов для анонимов.
+    """
+    return get_version(CONTENT_VERSION_KEY, None)
+
+
+def bump_content_version():
+    bump_version(CONTENT_VERSION_KEY, None)
+
+
+RANKING_VERSION_KEY = 'ranking:version'
+RANKED_ORDERINGS = ('popular', 'trending')
+
+
+def ranking_version():
+    """
+    Версия порядка по счётчикам (Избранное, балл trending): они меняются
+    UPDATE без сигналов, поэтому версию сдвигают сами места записи.
+    """
+    return get_version(RANKING_VERSION_KEY, None)
+
+
+def bump_ranking_version():
+    bump_version(RANKING_VERSION_KEY, None)
+
+
+def request_versions(request):
+    """
+    Версии данных, от которых зависит список Рецептов запроса: контент
+    и, для ?ordering=popular/trending, порядок по счётчикам.
+    """
+    versions = [content_version()]
+    if request.query_params.get('ordering') in RANKED_ORDERINGS:
+        versions.append(ranking_version())
+    return versions
+
+
+def response_cache_key(request):
+    """
+    Ключ ответа: версии данных запроса (request_versions), хост, путь и
+    параметры без порядка.
+    """
+    params = sorted(
+        (name, sorted(values))
+        for name, values in request.query_params.lists()
+    )
+    source = repr((request.build_absolute_uri('/'), request.path, params))
+    digest = hashlib.md5(source.encode('utf-8')).hexdigest()
+    versions = ':'.join(map(str, request_versions(request)))
+    return f'response:{versions}:{digest}'
+
+
+def wait_for(key, timeout):
+    """Значение key, которое кладёт другой запрос, или None через timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(settings.RESPONSE_CACHE_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return None
+
+
+class ViewerState:
+    """
+    Отметки пользователя на время запроса: id Рецептов в Избранном и
+    Списке покупок, id авторов из подписок. Каждое множество читается
+    при первом обращении - из общего кэша под текущей viewer_version
+    или одним запросом к базе. Представления отметок сдвигают версию,
+    и старые множества перестают читаться.
+    """
+
+    sources = {
+        'favorites': (Favorite, 'owner', 'recipe_id'),
+        'shopping': (Shopping, 'owner', 'recipe_id'),
+        'subscriptions': (Subscribe, 'user', 'author_id'),
+    }
+
+    def __init__(self, user):
+        self.user = user
+        self.version = None
+        self.sets = {}
+
+    @property
+    def favorites(self):
+        return self.get('favorites')
+
+    @property
+    def shopping(self):
+        return self.get('shopping')
+
+    @property
+    def subscriptions(self):
+        return self.get('subscriptions')
+
+    def get(self, name):
+        if self.user.is_anonymous:
+            return frozenset()
+        if name not in self.sets:
+            self.sets[name] = self.load(name)
+        return self.sets[name]
+
+    def load(self, name):
+        if self.version is None:
+            self.version = viewer_version(self.user)
+        model, owner, field = self.sources[name]
+        return cache.get_or_set(
+            f'viewer:{self.user.id}:{self.version}:{name}',
+            lambda: frozenset(model.objects.filter(
+                **{owner: self.user}).values_list(field, flat=True)),
+            settings.VIEWER_STATE_TIMEOUT)
+
+
+def get_viewer_state(request):
+    """ViewerState пользователя, один на запрос."""
+    http_request = getattr(request, '_request', request)
+    state = getattr(http_request, 'viewer_state', None)
+    if state is None or state.user != request.user:
+        http_request.viewer_state = ViewerState(request.user)
+    return http_request.viewer_state
+
+
+class ReferenceCache:
+    """
+    Версионированный кэш справочника (Тэги, Продукты).
+    Строки таблицы лежат в общем кэше Django под ключом с номером версии,
+    собранные объекты - в LRU памяти процесса. Изменение справочника
+    сдвигает версию, старые ключи просто перестают читаться.
+    Версия - отметка времени в мс, она же даёт ETag и Last-Modified.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.key = f'reference:{model._meta.db_table}'
+        self.load = lru_cache(
+            maxsize=settings.REFERENCE_CACHE_LOCAL_SIZE)(self._load)
+
+    def version(self):
+        return get_version(
+            f'{self.key}:version', settings.REFERENCE_CACHE_TIMEOUT)
+
+    def bump(self):
+        bump_version(f'{self.key}:version', settings.REFERENCE_CACHE_TIMEOUT)
+
+    def get(self):
+        return self.load(self.version())
+
+    def _load(self, version):
+        rows = cache.get(f'{self.key}:{version}')
+        if rows is None:
+            rows = list(self.model.objects.values_list(*self.fields))
+            cache.set(
+                f'{self.key}:{version}', rows,
+                settings.REFERENCE_CACHE_TIMEOUT)
+        objects = [
+            self.model.from_db(DEFAULT_DB_ALIAS, self.fields, row)
+            for row in rows
+        ]
+        return Reference(
+            version=version,
+            objects=objects,
+            by_id={obj.pk: obj for obj in objects},
+            data=[dict(zip(self.fields, row)) for row in rows],
+        )
+
+    def to_representation(self, obj):
+        return {field: getattr(obj, field) for field in self.fields}
+
+    def etag(self, version):
+        return f'"{self.key}:{version}"'
+
+
+tag_reference = ReferenceCache(Tag, ('id', 'name', 'color', 'slug'))
+ingredient_reference = ReferenceCache(
+    Ingredient, ('id', 'name', 'measurement_unit'))
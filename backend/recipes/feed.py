@@ -0,0 +1,60 @@
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models import Subscribe
+
+from .models import Recipe
+
+
+def timeline_key(user_id):
+    return f'feed:{user_id}'
+
+
+def feed_ids(user):
+    """id Рецептов авторов из подписок пользователя, новые первыми."""
+    return Recipe.objects.filter(
+        author__subscribing__user=user
+    ).order_by('-id').values_list('id', flat=True)
+
+
+def get_timeline(user):
+    """
+    Последние FEED_TIMELINE_SIZE id ленты по возрастанию из кэша.
+    Возвращает список и признак того, что лента в него не поместилась.
+    """
+    timeline = cache.get(timeline_key(user.id))
+    if timeline is None:
+        ids = list(feed_ids(user)[:settings.FEED_TIMELINE_SIZE])
+        timeline = (ids[::-1], len(ids) == settings.FEED_TIMELINE_SIZE)
+        cache.set(
+            timeline_key(user.id), timeline, settings.FEED_TIMELINE_TIMEOUT)
+    return timeline
+
+
+def feed_page(user, before, limit):
+    """
+    До limit id ленты меньше before (без before - с начала ленты).
+    Страница берётся из закэшированной ленты, за её пределами - одним
+    запросом по ключу id.
+    """
+    timeline, truncated = get_timeline(user)
+    end = len(timeline) if before is None else bisect_left(timeline, before)
+    page = timeline[max(end - limit, 0):end][::-1]
+    if len(page) < limit and truncated:
+        last = page[-1] if page else min(before, timeline[0])
+        page += list(feed_ids(user).filter(
+            id__lt=last)[:limit - len(page)])
+    return page
+
+
+def invalidate_timeline(user_id):
+    cache.delete(timeline_key(user_id))
+
+
+def invalidate_followers_timelines(author_id):
+    """Сброс лент всех подписчиков автора."""
+    followers = Subscribe.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    cache.delete_many([timeline_key(user_id) for user_id in followers])
@@ -1,5 +1,37 @@
+import base64
+import binascii
+import hashlib
+import posixpath
+from tempfile import SpooledTemporaryFile
+from urllib.parse import urlparse
+
+from django.conf import settings
 from django.core import validators
+from django.core.files.uploadedfile import UploadedFile
 from django.db import models
+from PIL import Image
+from rest_framework import serializers
+
+# Кусок base64 кратен 4 символам, чтобы декодироваться независимо.
+BASE64_CHUNK_SIZE = 64 * 1024
+
+
+def decode_base64(data):
+    """
+    Декодирование base64 кусками во временный файл: в памяти не лежит
+    вторая полная копия изображения, крупные файлы уходят на диск.
+    """
+    file = SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    tail = ''
+    for start in range(0, len(data), BASE64_CHUNK_SIZE):
+        chunk = tail + ''.join(data[start:start + BASE64_CHUNK_SIZE].split())
+        usable = len(chunk) - len(chunk) % 4
+        file.write(base64.b64decode(chunk[:usable], validate=True))
+        tail = chunk[usable:]
+    if tail:
+        raise ValueError('Длина base64 не кратна 4')
+    file.seek(0)
+    return file
 
 
 class ColorField(models.CharField):
@@ -9,3 +41,80 @@ class ColorField(models.CharField):
         kwargs.setdefault('max_length', 7)
         super().__init__(*args, **kwargs)
         self.validators.append(validators.RegexValidator(r'#[a-f\d]{6}'))
+
+
+class Base64ImageField(serializers.FileField):
+    """
+    Изображение строкой data:image/...;base64,..., обычным файлом или
+    ссылкой на уже загруженный файл (адрес из ответа API или путь в
+    хранилище) - тогда файл не передаётся повторно.
+    base64 декодируется кусками во временный файл, Pillow проверяет
+    только заголовок и структуру, не раскодируя пиксели.
+    Файл называется по SHA-256 содержимого и расширению настоящего формата;
+    если такой файл уже есть в хранилище, он не пишется повторно, а поле
+    возвращает путь к нему.
+    """
+
+    default_error_messages = {
+        'invalid_image': 'Загрузите корректное изображение.',
+        'image_not_found': 'Изображение не найдено.',
+    }
+    formats = {
+        'JPEG': 'jpg',
+        'PNG': 'png',
+        'GIF': 'gif',
+        'WEBP': 'webp',
+    }
+
+    @property
+    def model_field(self):
+        return self.parent.Meta.model._meta.get_field(self.source)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and not data.startswith('data:'):
+            return self.existing(data)
+        if isinstance(data, str):
+            data = self.decode(data)
+        file = super().to_internal_value(data)
+        try:
+            image = Image.open(file)
+            image.verify()
+        except Exception:
+            self.fail('invalid_image')
+        if image.format not in self.formats:
+            self.fail('invalid_image')
+        digest = hashlib.sha256()
+        for chunk in file.chunks():
+            digest.update(chunk)
+        file.seek(0)
+        file.name = f'{digest.hexdigest()}.{self.formats[image.format]}'
+        name = self.model_field.generate_filename(None, file.name)
+        if self.model_field.storage.exists(name):
+            return name
+        return file
+
+    def existing(self, data):
+        path = urlparse(data).path
+        if path.startswith(settings.MEDIA_URL):
+            path = path[len(settings.MEDIA_URL):]
+        name = posixpath.normpath(path).lstrip('/')
+        directory = self.model_field.generate_filename(None, 'file')
+        if (posixpath.dirname(name) != posixpath.dirname(directory)
+                or not self.model_field.storage.exists(name)):
+            self.fail('image_not_found')
+        return name
+
+    def decode(self, data):
+        header, _, payload = data.partition(';base64,')
+        if not header.startswith('data:image/') or not payload:
+            self.fail('invalid_image')
+        try:
+            file = decode_base64(payload)
+        except (binascii.Error, ValueError):
+            self.fail('invalid_image')
+        file.seek(0, 2)
+        size = file.tell()
+        file.seek(0)
+        return UploadedFile(
+            file, name='image', content_type=header[len('data:'):],
+            size=size)
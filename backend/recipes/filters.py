@@ -1,25 +1,81 @@
+from django.conf import settings
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
+from .cache import tag_reference
 from .models import Recipe
+from .search import ingredient_index, search_ingredients, search_recipes
 
 
-class IngredientSearchFilter(SearchFilter):
-    """Фильтрация Продуктов по Названию"""
+class IngredientSearchFilter(BaseFilterBackend):
+    """Автодополнение Продуктов по Названию"""
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name or view.action != 'list':
+            return queryset
+        name = name.lower()
+        limit = settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+        if settings.INGREDIENT_AUTOCOMPLETE_INDEX == 'memory':
+            return ingredient_index.search(name, limit)
+        return search_ingredients(queryset, name, limit)
+
+
+def tag_slug_choices():
+    return [(tag.slug, tag.name) for tag in tag_reference.get().objects]
+
+
+class TagSlugFilter(filters.MultipleChoiceFilter):
+    """
+    Рецепты хотя бы с одним из тэгов по slug.
+    Варианты и id тэгов берутся из tag_reference, Рецепты отбираются
+    подзапросом id__in по таблице связи: без DISTINCT, UPPER() и дублей.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('choices', tag_slug_choices)
+        kwargs.setdefault('distinct', False)
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        ids = [
+            tag.id for tag in tag_reference.get().objects if tag.slug in value
+        ]
+        return qs.filter(id__in=Recipe.tags.through.objects.filter(
+            tag_id__in=ids
+        ).values('recipe_id'))
+
+
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+    'cooking_time': ('cooking_time', '-id'),
+}
+
 
 class RecipeFilter(FilterSet):
-    """Фильтрация Рецептов по Избранному, Списку покупок и Тэгам"""
+    """
+    Фильтрация Рецептов по Избранному, Списку покупок, Тэгам
+    и полнотекстовый поиск (по умолчанию сортирует по релевантности).
+    Сортировка ?ordering= идёт по заранее посчитанным полям с индексами:
+    счётчику Избранного, баллу refresh_scores и времени приготовления.
+    """
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited'
     )
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_card'
     )
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug',
-        lookup_expr='iexact'
+    tags = TagSlugFilter()
+    search = filters.CharFilter(
+        method='filter_search'
+    )
+    ordering = filters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='filter_ordering'
     )
 
     def filter_is_favorited(self, queryset, field_name, value):
@@ -32,6 +88,18 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shoppings__owner=self.request.user)
         return queryset
 
+    def filter_search(self, queryset, field_name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, field_name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
     class Meta:
         model = Recipe
-        fields = ['author', 'is_favorited', 'is_in_shopping_cart', 'tags', ]
+        fields = [
+            'author', 'is_favorited', 'is_in_shopping_cart', 'tags',
+            'search', 'ordering',
+        ]
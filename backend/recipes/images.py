@@ -0,0 +1,125 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import bump_content_version
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = 'recipes/renditions'
+
+# Форматы уменьшенных копий: формат Pillow и расширение файла.
+RENDITION_FORMATS = (
+    ('WEBP', 'webp'),
+    ('JPEG', 'jpg'),
+)
+
+
+def rendition_name(name, rendition, extension):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{RENDITIONS_DIR}/{stem}_{rendition}.{extension}'
+
+
+def rendition_names(name):
+    """Имена всех уменьшенных копий изображения name."""
+    return [
+        rendition_name(name, rendition, extension)
+        for rendition in settings.IMAGE_RENDITIONS
+        for _, extension in RENDITION_FORMATS
+    ]
+
+
+def rendition_urls(recipe, request=None):
+    """
+    Адреса уменьшенных копий изображения Рецепта:
+    {'thumbnail': {'webp': url, 'jpg': url}, 'card': {...}}.
+    Пока копии строятся, возвращает None - клиент берёт оригинал.
+    """
+    if not recipe.image or not recipe.renditions_ready:
+        return None
+    urls = {}
+    for rendition in settings.IMAGE_RENDITIONS:
+        urls[rendition] = {}
+        for _, extension in RENDITION_FORMATS:
+            url = default_storage.url(
+                rendition_name(recipe.image.name, rendition, extension))
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[rendition][extension] = url
+    return urls
+
+
+def build_renditions(recipe_id, name, force=False):
+    """
+    Построение уменьшенных копий изображения name для всех размеров
+    и форматов. Имена файлов изображений - хэш содержимого, поэтому
+    уже существующие копии без force не перестраиваются. Флаг
+    renditions_ready ставится, только если изображение Рецепта за это
+    время не сменилось.
+    """
+    if not force and all(map(default_storage.exists, rendition_names(name))):
+        Recipe.objects.filter(pk=recipe_id, image=name).update(
+            renditions_ready=True, updated=timezone.now())
+        bump_content_version()
+        return
+    with default_storage.open(name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        has_alpha = 'A' in image.mode or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    for rendition, size in settings.IMAGE_RENDITIONS.items():
+        resized = image.copy()
+        resized.thumbnail(size, Image.LANCZOS)
+        for image_format, extension in RENDITION_FORMATS:
+            if image_format == 'JPEG' and resized.mode != 'RGB':
+                resized = resized.convert('RGB')
+            buffer = BytesIO()
+            resized.save(
+                buffer, image_format,
+                quality=settings.IMAGE_RENDITION_QUALITY, optimize=True)
+            target = rendition_name(name, rendition, extension)
+            default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+    Recipe.objects.filter(pk=recipe_id, image=name).update(
+        renditions_ready=True, updated=timezone.now())
+    bump_content_version()
+
+
+def run_in_worker(recipe_id, name):
+    try:
+        build_renditions(recipe_id, name)
+    except Exception:
+        logger.exception(
+            'Не удалось построить копии %s для Рецепта %s', name, recipe_id)
+    finally:
+        connection.close()
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_RENDITION_WORKERS,
+        thread_name_prefix='renditions')
+
+
+def schedule_renditions(recipe_id, name):
+    """
+    Построение копий в пуле потоков (Pillow отпускает GIL на сжатии
+    и кодировании), запрос не ждёт. При IMAGE_RENDITION_WORKERS = 0
+    копии строятся сразу.
+    """
+    if not settings.IMAGE_RENDITION_WORKERS:
+        build_renditions(recipe_id, name)
+        return
+    get_executor().submit(run_in_worker, recipe_id, name)
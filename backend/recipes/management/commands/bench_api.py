@@ -0,0 +1,189 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.profiling import PERCENTILES, QueryRecorder, percentile
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import Subscribe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк основных эндпоинтов API через тестовый клиент Django.
+    Для каждого сценария меряются число SQL-запросов, задержка
+    (p50/p95/p99 по --repeat повторам после --warmup прогревочных)
+    и пик памяти Python (tracemalloc, отдельный прогон). Запросы на запись
+    выполняются в транзакции и откатываются.
+    Отчёт пишется в JSON (--output); с --baseline он сравнивается
+    с прошлым отчётом, и при росте числа запросов или p95 больше чем на
+    --max-regression процентов команда завершается ошибкой (для CI).
+    Данные - из generate_data.
+    Использование:
+    python manage.py bench_api [--repeat 20] [--warmup 2]
+    [--output bench.json] [--baseline old.json] [--max-regression 20]
+    """
+
+    help = 'Бенчмарк эндпоинтов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество замеров каждого сценария')
+        parser.add_argument(
+            '--warmup', type=int, default=2,
+            help='Количество прогревочных запросов')
+        parser.add_argument(
+            '-o', '--output', default='bench.json',
+            help='Файл отчёта')
+        parser.add_argument(
+            '--baseline',
+            help='Отчёт прошлого запуска для сравнения')
+        parser.add_argument(
+            '--max-regression', type=float,
+            help='Допустимый рост p95 в процентах')
+
+    def get_user(self):
+        user_id = Subscribe.objects.filter(
+            user__recipes__isnull=False,
+            user__shopping_owners__isnull=False,
+        ).values_list('user_id', flat=True).first()
+        if user_id is None:
+            raise CommandError('Нет данных, запустите generate_data')
+        return User.objects.get(pk=user_id)
+
+    def scenarios(self, user):
+        recipe = Recipe.objects.filter(author=user).first()
+        tags = list(Tag.objects.values_list('id', 'slug')[:2])
+        ingredients = list(Ingredient.objects.values_list('id', 'name')[:5])
+        payload = {
+            'name': 'Бенчмарк',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': recipe.image.url,
+            'tags': [tag_id for tag_id, _ in tags],
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id, _ in ingredients
+            ],
+        }
+        slugs = '&'.join(f'tags={slug}' for _, slug in tags)
+        return [
+            ('recipes_list', 'get', '/api/recipes/', None),
+            ('recipes_list_filtered', 'get',
+             f'/api/recipes/?{slugs}&is_favorited=1', None),
+            ('recipes_list_popular', 'get',
+             '/api/recipes/?ordering=popular', None),
+            ('recipes_feed', 'get', '/api/recipes/feed/', None),
+            ('recipe_detail', 'get', f'/api/recipes/{recipe.id}/', None),
+            ('ingredients_search', 'get',
+             f'/api/ingredients/?name={ingredients[0][1][:3]}', None),
+            ('subscriptions', 'get',
+             '/api/users/subscriptions/?recipes_limit=3', None),
+            ('download_shopping_cart', 'get',
+             '/api/recipes/download_shopping_cart/', None),
+            ('recipe_create', 'post', '/api/recipes/', payload),
+            ('recipe_update', 'put', f'/api/recipes/{recipe.id}/', payload),
+        ]
+
+    def request(self, client, method, url, data):
+        with transaction.atomic():
+            response = getattr(client, method)(url, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            transaction.set_rollback(True)
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {url}: {response.status_code}')
+        return response
+
+    def measure(self, client, method, url, data, repeat, warmup):
+        for _ in range(warmup):
+            self.request(client, method, url, data)
+        latencies = []
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                self.request(client, method, url, data)
+                latencies.append((time.perf_counter() - start) * 1000)
+        tracemalloc.start()
+        self.request(client, method, url, data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        result = {
+            f'p{rank}_ms': round(percentile(latencies, rank), 2)
+            for rank in PERCENTILES
+        }
+        result.update({
+            'mean_ms': round(statistics.mean(latencies), 2),
+            'queries': sum(
+                count for sql, count in recorder.fingerprints.items()
+                if 'SAVEPOINT' not in sql
+            ) // repeat,
+            'peak_memory_kb': round(peak / 1024, 1),
+        })
+        return result
+
+    def compare(self, report, baseline_path, max_regression):
+        with open(baseline_path, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['scenarios']
+        failed = []
+        for name, result in report['scenarios'].items():
+            old = baseline.get(name)
+            if old is None:
+                continue
+            change = (result['p95_ms'] / old['p95_ms'] - 1) * 100
+            self.stdout.write(
+                f'{name}: p95 {old["p95_ms"]} -> {result["p95_ms"]} мс '
+                f'({change:+.0f}%), запросов {old["queries"]} -> '
+                f'{result["queries"]}')
+            if result['queries'] > old['queries'] or (
+                    max_regression is not None and change > max_regression):
+                failed.append(name)
+        if failed:
+            raise CommandError(f'Регрессия: {", ".join(failed)}')
+
+    def handle(self, *args, **kwargs):
+        settings.ALLOWED_HOSTS = ['*']
+        user = self.get_user()
+        client = APIClient()
+        client.force_authenticate(user)
+        report = {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'rows': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+            },
+            'repeat': kwargs['repeat'],
+            'scenarios': {},
+        }
+        for name, method, url, data in self.scenarios(user):
+            result = self.measure(
+                client, method, url, data,
+                kwargs['repeat'], kwargs['warmup'])
+            report['scenarios'][name] = result
+            self.stdout.write(
+                f'{name}: p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} '
+                f'мс, запросов {result["queries"]}, '
+                f'память {result["peak_memory_kb"]} КБ')
+        with open(kwargs['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        if kwargs['baseline']:
+            self.compare(
+                report, kwargs['baseline'], kwargs['max_regression'])
@@ -0,0 +1,121 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+
+from api.profiling import PERCENTILES, percentile
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный тест накладных расходов на подключение к базе.
+    --concurrency потоков делают через WSGI-обработчик Django (как
+    воркер gunicorn, с закрытием соединений по CONN_MAX_AGE) по
+    --requests запросов к --url в двух режимах: новое соединение на
+    каждый запрос (CONN_MAX_AGE=0, как без api.settings_production) и
+    постоянные соединения (CONN_MAX_AGE=--conn-max-age). Для режимов
+    выводятся число открытых соединений, p50/p95/p99 задержки и
+    запросов в секунду. С бэкендом api.postgresql_pool (DB_POOL=True)
+    первый режим берёт соединения из пула.
+    Использование:
+    python manage.py bench_connections [--url /api/recipes/]
+    [--concurrency 8] [--requests 50] [--conn-max-age 60]
+    """
+
+    help = 'Нагрузочный тест подключений к базе'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='/api/recipes/',
+            help='Адрес запросов')
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Количество параллельных потоков')
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов на поток')
+        parser.add_argument(
+            '--conn-max-age', type=int, default=60,
+            help='CONN_MAX_AGE режима постоянных соединений')
+
+    def worker(self, url, count):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        statuses = []
+        latencies = []
+        try:
+            for _ in range(count):
+                start = time.perf_counter()
+                response = handler(
+                    factory.get(url).environ,
+                    lambda status, headers: statuses.append(status))
+                b''.join(response)
+                response.close()
+                latencies.append((time.perf_counter() - start) * 1000)
+                if not statuses[-1].startswith(('2', '3')):
+                    raise CommandError(f'GET {url}: {statuses[-1]}')
+        finally:
+            connections.close_all()
+        return latencies
+
+    def run(self, conn_max_age, kwargs):
+        database = connections.databases[DEFAULT_DB_ALIAS]
+        previous = database.get('CONN_MAX_AGE', 0)
+        database['CONN_MAX_AGE'] = conn_max_age
+        opened = [0]
+        lock = Lock()
+
+        def created(sender, **signal_kwargs):
+            with lock:
+                opened[0] += 1
+
+        connection_created.connect(created, weak=False)
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(kwargs['concurrency']) as executor:
+                futures = [
+                    executor.submit(
+                        self.worker, kwargs['url'], kwargs['requests'])
+                    for _ in range(kwargs['concurrency'])
+                ]
+                latencies = [
+                    latency
+                    for future in futures
+                    for latency in future.result()
+                ]
+        finally:
+            connection_created.disconnect(created)
+            database['CONN_MAX_AGE'] = previous
+        elapsed = time.perf_counter() - start
+        result = {
+            f'p{rank}_ms': round(percentile(latencies, rank), 2)
+            for rank in PERCENTILES
+        }
+        result.update({
+            'connections': opened[0],
+            'rps': round(len(latencies) / elapsed, 1),
+        })
+        return result
+
+    def handle(self, *args, **kwargs):
+        settings.ALLOWED_HOSTS = ['*']
+        engine = connections.databases[DEFAULT_DB_ALIAS]['ENGINE']
+        self.stdout.write(
+            f'{engine}: {kwargs["concurrency"]} потоков по '
+            f'{kwargs["requests"]} запросов к {kwargs["url"]}')
+        modes = (
+            ('новое соединение', 0),
+            ('постоянные соединения', kwargs['conn_max_age']),
+        )
+        for name, conn_max_age in modes:
+            result = self.run(conn_max_age, kwargs)
+            self.stdout.write(
+                f'{name}: соединений {result["connections"]}, '
+                f'p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс, '
+                f'p99 {result["p99_ms"]} мс, {result["rps"]} запросов/с')
@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.renderers import DUMPS
+from recipes.cache import ingredient_reference
+from recipes.models import Recipe
+from recipes.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк рендеринга JSON: стандартный JSONRenderer DRF
+    (ensure_ascii) против библиотек api.renderers.FastJSONRenderer
+    на странице из --size Рецептов и на полном каталоге Продуктов.
+    Для каждой установленной библиотеки - лучшее время из --repeat
+    прогонов и размер ответа. Данные - из generate_data.
+    Использование:
+    python manage.py bench_renderers [--size 100] [--repeat 20]
+    """
+
+    help = 'Бенчмарк рендеринга JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int, default=100,
+            help='Количество Рецептов на странице')
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество замеров')
+
+    def best_time(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+    def payloads(self, size):
+        recipes = list(Recipe.objects.with_related()[:size])
+        if not recipes:
+            raise CommandError('Нет данных, запустите generate_data')
+        context = {
+            'request': Request(APIRequestFactory().get('/api/recipes/'))
+        }
+        return (
+            ('recipes_list', {
+                'count': len(recipes),
+                'results': RecipeSerializer(
+                    recipes, many=True, context=context).data,
+            }),
+            ('ingredients', ingredient_reference.get().data),
+        )
+
+    def renderers(self):
+        default = JSONEncoder().default
+        yield 'drf', JSONRenderer().render
+        for name, (module, dumps) in DUMPS.items():
+            if module is not None:
+                yield name, lambda data, dumps=dumps: dumps(data, default)
+
+    def handle(self, *args, **kwargs):
+        for payload, data in self.payloads(kwargs['size']):
+            for name, render in self.renderers():
+                elapsed = self.best_time(
+                    lambda: render(data), kwargs['repeat'])
+                self.stdout.write(
+                    f'{payload} {name}: {elapsed * 1000:.2f} мс, '
+                    f'{len(render(data)) / 1024:.1f} КБ')
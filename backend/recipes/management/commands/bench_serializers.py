@@ -0,0 +1,152 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.serializers import RecipeSerializer, TagSerializer
+from users.serializers import ProfileSerializer
+
+User = get_user_model()
+
+
+class LegacyIngredientAmountSerializer(serializers.ModelSerializer):
+    """Продукты Рецепта в прежнем виде (вложенный сериализатор)"""
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class LegacyRecipeSerializer(serializers.ModelSerializer):
+    """Рецепт в прежнем виде: вложенные сериализаторы и Base64ImageField"""
+
+    tags = TagSerializer(many=True)
+    author = ProfileSerializer()
+    ingredients = serializers.SerializerMethodField()
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+    image = Base64ImageField()
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id',
+            'tags',
+            'author',
+            'ingredients',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'name',
+            'image',
+            'text',
+            'cooking_time',
+        )
+
+    def get_is_favorited(self, obj):
+        return obj.is_favorited
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.is_in_shopping_cart
+
+    def get_ingredients(self, obj):
+        return LegacyIngredientAmountSerializer(
+            obj.recipe_ingredients.all(), many=True
+        ).data
+
+
+class Command(BaseCommand):
+    """
+    Микробенчмарк сериализации страницы Рецептов.
+    Сравнивает прежний путь (RecipeCreateSerializer.to_representation
+    создавал ModelSerializer с вложенными сериализаторами на каждый объект)
+    с облегчённым RecipeSerializer.
+    Объекты собираются в памяти, база данных не используется.
+    Использование:
+    python manage.py bench_serializers [--size 1000] [--repeat 5]
+    """
+
+    help = 'Сравнение стоимости сериализации Рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int, default=1000,
+            help='Количество Рецептов на странице')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Количество повторов, берётся лучшее время')
+
+    def build_page(self, size):
+        author = User(
+            id=1, email='author@foodgram.ru', username='author',
+            first_name='Имя', last_name='Фамилия')
+        author.is_subscribed = False
+        tags = [
+            Tag(id=num, name=f'Тэг {num}', color='#aabbcc', slug=f'tag{num}')
+            for num in range(1, 4)
+        ]
+        ingredients = [
+            Ingredient(id=num, name=f'Продукт {num}', measurement_unit='г')
+            for num in range(1, 11)
+        ]
+        page = []
+        for num in range(1, size + 1):
+            recipe = Recipe(
+                id=num, author=author, name=f'Рецепт {num}',
+                text='Описание рецепта ' * 20, image='recipes/image.png',
+                cooking_time=num % 120 + 1)
+            recipe.is_favorited = bool(num % 2)
+            recipe.is_in_shopping_cart = bool(num % 3)
+            recipe.is_subscribed = False
+            recipe._prefetched_objects_cache = {
+                'tags': tags,
+                'recipe_ingredients': [
+                    RecipeIngredient(
+                        recipe=recipe, ingredient=ingredient, amount=num)
+                    for ingredient in ingredients
+                ],
+            }
+            page.append(recipe)
+        return page
+
+    def best_time(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best
+
+    def handle(self, *args, **kwargs):
+        size = kwargs['size']
+        repeat = kwargs['repeat']
+        page = self.build_page(size)
+        context = {
+            'request': Request(APIRequestFactory().get('/api/recipes/'))
+        }
+
+        def before():
+            return [
+                LegacyRecipeSerializer(obj, context=context).data
+                for obj in page
+            ]
+
+        def after():
+            return RecipeSerializer(page, many=True, context=context).data
+
+        for name, func in (('before', before), ('after', after)):
+            elapsed = self.best_time(func, repeat)
+            self.stdout.write(
+                f'{name}: {elapsed * 1000:.1f} мс на страницу, '
+                f'{elapsed / size * 1e6:.1f} мкс на Рецепт')
@@ -0,0 +1,134 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import override_settings
+from django_filters.rest_framework import FilterSet, filters
+
+from recipes.cache import tag_reference
+from recipes.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+BENCH_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench_tag_filter',
+    }
+}
+
+
+class LegacyRecipeFilter(FilterSet):
+    """Фильтр по тэгам в прежнем виде"""
+
+    tags = filters.AllValuesMultipleFilter(
+        field_name='tags__slug',
+        lookup_expr='iexact'
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ['tags', ]
+
+
+class Command(BaseCommand):
+    """
+    Бенчмарк фильтра Рецептов по тэгам.
+    Сравнивает прежний AllValuesMultipleFilter (SELECT DISTINCT по всем
+    slug для вариантов, UPPER() в условии, JOIN с DISTINCT) с TagSlugFilter
+    (тэги из кэша, подзапрос id__in). Для каждого фильтра меряется
+    валидация, COUNT и первая страница, как при запросе списка.
+    Данные создаются внутри транзакции и откатываются после замеров,
+    версии справочника тэгов сдвигаются в отдельном кэше в памяти:
+    общий кэш приложения команда не трогает.
+    Использование:
+    python manage.py bench_tag_filter [--recipes 100000] [--tags 5]
+    [--repeat 5]
+    """
+
+    help = 'Сравнение фильтров Рецептов по тэгам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=100000,
+            help='Количество Рецептов')
+        parser.add_argument(
+            '--tags', type=int, default=5,
+            help='Количество тэгов')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Количество повторов, берётся лучшее время')
+        parser.add_argument(
+            '-bs', '--batch_size', type=int, default=5000,
+            help="Количество строк в одной пачке")
+
+    def fill(self, recipes, tags, batch_size):
+        author = User.objects.create(
+            username='bench_tag_filter', email='bench_tag_filter@foodgram.ru',
+            first_name='Бенчмарк', last_name='Тэгов')
+        tag_ids = [
+            Tag.objects.create(
+                name=f'Тэг {num}', color='#aabbcc', slug=f'bench-tag-{num}'
+            ).id
+            for num in range(tags)
+        ]
+        through = Recipe.tags.through
+        rng = random.Random(0)
+        for start in range(0, recipes, batch_size):
+            batch = Recipe.objects.bulk_create([
+                Recipe(
+                    author=author, name=f'Рецепт {num}', text='Описание',
+                    image='recipes/bench.png', cooking_time=num % 120 + 1)
+                for num in range(start, min(start + batch_size, recipes))
+            ])
+            if batch[0].pk is None:
+                batch = Recipe.objects.filter(
+                    author=author).order_by('-id')[:len(batch)]
+            through.objects.bulk_create([
+                through(recipe_id=recipe.pk, tag_id=tag_id)
+                for recipe in batch
+                for tag_id in rng.sample(tag_ids, rng.randint(1, 3))
+            ])
+        tag_reference.bump()
+
+    def run(self, filterset_class, data):
+        filterset = filterset_class(data, queryset=Recipe.objects.all())
+        filterset.is_valid()
+        queryset = filterset.qs
+        count = queryset.count()
+        page = list(queryset.values_list('id', flat=True)[:6])
+        return count, len(page)
+
+    def best_time(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best, result
+
+    def handle(self, *args, **kwargs):
+        with override_settings(CACHES=BENCH_CACHES), transaction.atomic():
+            self.fill(kwargs['recipes'], kwargs['tags'], kwargs['batch_size'])
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            data = QueryDict(mutable=True)
+            data.setlist('tags', ['bench-tag-0', 'bench-tag-1'])
+            for name, filterset_class in (
+                ('before', LegacyRecipeFilter),
+                ('after', RecipeFilter),
+            ):
+                elapsed, (count, page) = self.best_time(
+                    lambda: self.run(filterset_class, data),
+                    kwargs['repeat'])
+                self.stdout.write(
+                    f'{name}: {elapsed * 1000:.1f} мс на запрос, '
+                    f'найдено {count}, на странице {page}')
+            transaction.set_rollback(True)
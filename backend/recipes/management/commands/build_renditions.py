@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import build_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Построение уменьшенных копий изображений Рецептов, у которых их
+    ещё нет (загруженных до появления копий или с ошибкой построения).
+    Использование:
+    python manage.py build_renditions [--all]
+    """
+
+    help = 'Построение уменьшенных копий изображений Рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Перестроить копии всех Рецептов")
+
+    def handle(self, *args, **kwargs):
+        recipes = Recipe.objects.exclude(image='').order_by('id')
+        if not kwargs['all']:
+            recipes = recipes.filter(renditions_ready=False)
+        built = failed = 0
+        for recipe_id, name in recipes.values_list('id', 'image').iterator():
+            try:
+                build_renditions(recipe_id, name, force=kwargs['all'])
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+                continue
+            built += 1
+        self.stdout.write(f'Построено {built}, с ошибкой {failed}')
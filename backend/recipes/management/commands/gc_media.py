@@ -0,0 +1,67 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.images import RENDITIONS_DIR, rendition_names
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Удаление файлов изображений, на которые не ссылается ни один Рецепт,
+    и их уменьшенных копий. Изображения хранятся по хэшу содержимого и
+    могут быть общими у нескольких Рецептов, поэтому при удалении
+    или замене изображения файл не удаляется сразу.
+    Файлы моложе --grace минут не трогаются: их могла записать ещё
+    не закоммиченная транзакция.
+    Использование:
+    python manage.py gc_media [--grace 60] [--dry-run]
+    """
+
+    help = 'Удаление изображений Рецептов без ссылок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=60,
+            help='Не удалять файлы моложе стольких минут')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы для удаления')
+
+    def referenced(self):
+        names = set()
+        images = Recipe.objects.exclude(image='').values_list(
+            'image', flat=True).distinct().iterator()
+        for name in images:
+            names.add(name)
+            names.update(rendition_names(name))
+        return names
+
+    def stored(self, directory):
+        if not default_storage.exists(directory):
+            return
+        for name in default_storage.listdir(directory)[1]:
+            yield posixpath.join(directory, name)
+
+    def handle(self, *args, **kwargs):
+        deadline = timezone.now() - timedelta(minutes=kwargs['grace'])
+        upload_to = Recipe._meta.get_field('image').upload_to
+        referenced = self.referenced()
+        removed = size = 0
+        for directory in (upload_to.rstrip('/'), RENDITIONS_DIR):
+            for name in self.stored(directory):
+                if (name in referenced
+                        or default_storage.get_modified_time(name) > deadline):
+                    continue
+                size += default_storage.size(name)
+                removed += 1
+                if kwargs['dry_run']:
+                    self.stdout.write(name)
+                else:
+                    default_storage.delete(name)
+        self.stdout.write(
+            f'{"Найдено" if kwargs["dry_run"] else "Удалено"} файлов '
+            f'{removed}, {size / 1024 / 1024:.1f} МБ')
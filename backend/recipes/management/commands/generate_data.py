@@ -0,0 +1,192 @@
+import hashlib
+import random
+from datetime import timedelta
+from io import BytesIO
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from recipes.cache import bump_content_version
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            Shopping, Tag)
+from recipes.search import cook_index
+from users.models import Subscribe
+
+User = get_user_model()
+
+# Пароль всех сгенерированных пользователей.
+PASSWORD = 'foodgram-bench'
+
+
+def batched(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    """
+    Генерация синтетических данных для бенчмарков.
+    Продукты и Тэги загружаются из data/ командой import_csv, остальное
+    создаётся пачками bulk_create: пользователи, Рецепты с 5-30
+    продуктами и 1-3 тэгами, Избранное, Списки покупок и Подписки
+    с датами за последние --days дней. После загрузки пересчитываются
+    счётчики и баллы популярности. При одном --seed данные одинаковые.
+    Использование:
+    python manage.py generate_data [--users 100] [--recipes 1000]
+    [--favorites 20] [--shopping 5] [--subscriptions 10] [--seed 0]
+    """
+
+    help = 'Генерация синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=100,
+            help='Количество пользователей')
+        parser.add_argument(
+            '--recipes', type=int, default=1000,
+            help='Количество Рецептов')
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Рецептов в Избранном у пользователя (в среднем)')
+        parser.add_argument(
+            '--shopping', type=int, default=5,
+            help='Рецептов в Списке покупок у пользователя (в среднем)')
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Подписок у пользователя (в среднем)')
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='За сколько дней раскидать даты Избранного и Покупок')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел')
+        parser.add_argument(
+            '-bs', '--batch_size', type=int, default=1000,
+            help="Количество строк в одной пачке")
+
+    def image(self):
+        """Одно изображение на все Рецепты, по хэшу как Base64ImageField."""
+        buffer = BytesIO()
+        Image.new('RGB', (640, 480), (230, 180, 90)).save(buffer, 'JPEG')
+        content = buffer.getvalue()
+        field = Recipe._meta.get_field('image')
+        name = field.generate_filename(
+            None, f'{hashlib.sha256(content).hexdigest()}.jpg')
+        if not field.storage.exists(name):
+            field.storage.save(name, ContentFile(content))
+        return name
+
+    def create_users(self, count, batch_size):
+        start = User.objects.count()
+        password = make_password(PASSWORD)
+        users = (
+            User(
+                username=f'bench{num}', email=f'bench{num}@foodgram.ru',
+                first_name='Имя', last_name=f'Фамилия {num}',
+                password=password)
+            for num in range(start, start + count)
+        )
+        for batch in batched(users, batch_size):
+            User.objects.bulk_create(batch)
+        return list(User.objects.filter(
+            username__startswith='bench').order_by('-id').values_list(
+                'id', flat=True)[:count])
+
+    def create_recipes(self, rng, count, user_ids, batch_size):
+        image = self.image()
+        recipes = (
+            Recipe(
+                author_id=rng.choice(user_ids), name=f'Рецепт {num}',
+                text=' '.join(['Описание рецепта.'] * rng.randint(5, 50)),
+                image=image, cooking_time=rng.randint(5, 180))
+            for num in range(count)
+        )
+        for batch in batched(recipes, batch_size):
+            Recipe.objects.bulk_create(batch)
+        return list(Recipe.objects.filter(
+            image=image).order_by('-id').values_list('id', flat=True)[:count])
+
+    def create_recipe_links(self, rng, recipe_ids, batch_size):
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        ingredients = (
+            RecipeIngredient(
+                recipe_id=recipe_id, ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500))
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(
+                ingredient_ids, min(rng.randint(5, 30), len(ingredient_ids)))
+        )
+        for batch in batched(ingredients, batch_size):
+            RecipeIngredient.objects.bulk_create(batch)
+        through = Recipe.tags.through
+        tags = (
+            through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, min(rng.randint(1, 3),
+                                                  len(tag_ids)))
+        )
+        for batch in batched(tags, batch_size):
+            through.objects.bulk_create(batch)
+
+    def create_likes(self, rng, model, per_user, user_ids, recipe_ids, days,
+                     batch_size):
+        now = timezone.now()
+        likes = (
+            model(
+                owner_id=user_id, recipe_id=recipe_id,
+                created=now - timedelta(seconds=rng.randint(0, days * 86400)))
+            for user_id in user_ids
+            for recipe_id in rng.sample(
+                recipe_ids,
+                min(rng.randint(0, per_user * 2), len(recipe_ids)))
+        )
+        for batch in batched(likes, batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def create_subscriptions(self, rng, per_user, user_ids, batch_size):
+        subscriptions = (
+            Subscribe(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in rng.sample(
+                user_ids, min(rng.randint(0, per_user * 2), len(user_ids)))
+            if author_id != user_id
+        )
+        for batch in batched(subscriptions, batch_size):
+            Subscribe.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def handle(self, *args, **kwargs):
+        rng = random.Random(kwargs['seed'])
+        batch_size = kwargs['batch_size']
+        call_command('import_csv', stdout=self.stdout)
+        with transaction.atomic():
+            user_ids = self.create_users(kwargs['users'], batch_size)
+            recipe_ids = self.create_recipes(
+                rng, kwargs['recipes'], user_ids, batch_size)
+            self.create_recipe_links(rng, recipe_ids, batch_size)
+            self.create_likes(
+                rng, Favorite, kwargs['favorites'], user_ids, recipe_ids,
+                kwargs['days'], batch_size)
+            self.create_likes(
+                rng, Shopping, kwargs['shopping'], user_ids, recipe_ids,
+                kwargs['days'], batch_size)
+            self.create_subscriptions(
+                rng, kwargs['subscriptions'], user_ids, batch_size)
+        bump_content_version()
+        cook_index.bump()
+        call_command('recount', stdout=self.stdout)
+        call_command('refresh_scores', full=True, stdout=self.stdout)
+        self.stdout.write(
+            f'Создано пользователей {len(user_ids)}, '
+            f'Рецептов {len(recipe_ids)}, пароль {PASSWORD}')
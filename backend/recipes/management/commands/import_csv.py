@@ -1,11 +1,84 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from recipes.cache import ingredient_reference, tag_reference
 from recipes.models import Ingredient, Tag
 
+FORMATS = ('csv', 'jsonl', 'json')
+
+
+def read_csv(file):
+    yield from csv.DictReader(file, delimiter=',', quotechar='"')
+
+
+def read_jsonl(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_json(file, chunk_size=64 * 1024):
+    """Потоковое чтение JSON-массива объектов без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if not started and buffer:
+            if buffer[0] != '[':
+                raise CommandError('Ожидается JSON-массив объектов')
+            started = True
+            buffer = buffer[1:].lstrip(' \t\r\n,')
+        if buffer.startswith(']'):
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                if buffer:
+                    raise CommandError('Некорректный JSON в конце файла')
+                return
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield obj
+        buffer = buffer[end:]
+
+
+READERS = {
+    'csv': read_csv,
+    'jsonl': read_jsonl,
+    'json': read_json,
+}
+
+
+class IteratorFile:
+    """
+    Файлоподобная обёртка над итератором строк для COPY FROM STDIN.
+    psycopg2 отправляет куски любой длины, поэтому read() отдаёт
+    по lines_per_read строк, не обращая внимания на size.
+    """
+
+    lines_per_read = 1000
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def read(self, size=-1):
+        return ''.join(islice(self.lines, self.lines_per_read))
+
+    readline = read
+
 
 class Command(BaseCommand):
     """
@@ -13,39 +86,127 @@ class Command(BaseCommand):
     Использование:
     1. отредактировать список app_models, теми файлами, которые надо загрузить.
     Ключ в словаре - имя файла (без разрешения), значение - модель
-    2. имена полей таблиц базы данных и заголовков в csv файле должны точно
+    2. имена полей таблиц базы данных и заголовков в файле должны точно
     соответстовать
-    3. все поля таблицы базы данных, которые не заполняются из csv должны иметь
-    возможность быть пустыми или Null
-    4. запустить файл импорта командой
-    python manage.py import_csv [-dd]
+    3. все поля таблицы базы данных, которые не заполняются из файла должны
+    иметь возможность быть пустыми или Null
+    4. файлы читаются потоково: csv, jsonl (объект на строку) или json
+    (массив объектов); без --format берётся первый найденный по этому порядку
+    5. строки пишутся пачками по --batch_size в одной транзакции, уже
+    существующие записи пропускаются, поэтому команду можно запускать повторно
+    6. --copy на PostgreSQL загружает данные через COPY во временную таблицу
+    7. запустить файл импорта командой
+    python manage.py import_csv [-dd] [-f] [-m] [-bs] [--copy]
     """
 
     help = 'Загрузка данных в базу'
 
+    app_models = {
+        'ingredients': Ingredient,
+        'tags': Tag,
+    }
+    references = {
+        Ingredient: ingredient_reference,
+        Tag: tag_reference,
+    }
+
     def add_arguments(self, parser):
         parser.add_argument(
             '-dd', '--data_dir',
             default=os.path.join(os.path.dirname(settings.BASE_DIR), 'data/'),
             help="Директория начальных данных для загрузки")
+        parser.add_argument(
+            '-f', '--format', choices=FORMATS,
+            help="Формат файлов данных")
+        parser.add_argument(
+            '-m', '--model', choices=list(self.app_models), action='append',
+            help="Загрузить только указанные таблицы")
+        parser.add_argument(
+            '-bs', '--batch_size', type=int, default=1000,
+            help="Количество строк в одной пачке")
+        parser.add_argument(
+            '--copy', action='store_true',
+            help="Загрузка через COPY (только PostgreSQL)")
+
+    def find_file(self, data_dir, file_name, file_format):
+        formats = (file_format,) if file_format else FORMATS
+        for ext in formats:
+            path = os.path.join(data_dir, f'{file_name}.{ext}')
+            if os.path.exists(path):
+                return path, ext
+        return None, None
+
+    def load_batches(self, model, rows, batch_size):
+        total = 0
+        while True:
+            batch = [model(**row) for row in islice(rows, batch_size)]
+            if not batch:
+                return total
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+
+    def load_copy(self, model, rows):
+        table = model._meta.db_table
+        fields = [
+            field.column for field in model._meta.concrete_fields
+            if not field.primary_key
+        ]
+        columns = ', '.join(fields)
+        counter = {'rows': 0}
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def lines():
+            for row in rows:
+                counter['rows'] += 1
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow([row[field] for field in fields])
+                yield buffer.getvalue()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE import_{table} ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {table} WITH NO DATA')
+            cursor.copy_expert(
+                f'COPY import_{table} ({columns}) FROM STDIN '
+                f'WITH (FORMAT csv)',
+                IteratorFile(lines()))
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT {columns} FROM import_{table} '
+                f'ON CONFLICT DO NOTHING')
+        return counter['rows']
 
     def handle(self, *args, **kwargs):
         data_dir = kwargs['data_dir']
+        use_copy = kwargs['copy']
+        if use_copy and connection.vendor != 'postgresql':
+            raise CommandError('--copy работает только с PostgreSQL')
+        names = kwargs['model'] or list(self.app_models)
 
-        app_models = {
-            'ingredients': Ingredient,
-            'tags': Tag,
-        }
-
-        for file_name, model in app_models.items():
-            with open(
-                f'{data_dir}{file_name}.csv', encoding='utf-8'
-            ) as csv_file:
-                reader = csv.DictReader(
-                    csv_file, delimiter=',', quotechar='"')
-
-                for line in reader:
-                    model.objects.create(**line)
-            csv_file.close()
-            self.stdout.write(
-                f'Данные добавлены в таблицу recipes_{file_name}')
+        with transaction.atomic():
+            for file_name in names:
+                model = self.app_models[file_name]
+                path, ext = self.find_file(
+                    data_dir, file_name, kwargs['format'])
+                if path is None:
+                    self.stdout.write(self.style.WARNING(
+                        f'Нет файла данных для recipes_{file_name}'))
+                    continue
+                before = model.objects.count()
+                start = time.perf_counter()
+                with open(path, encoding='utf-8') as data_file:
+                    rows = READERS[ext](data_file)
+                    if use_copy:
+                        total = self.load_copy(model, rows)
+                    else:
+                        total = self.load_batches(
+                            model, rows, kwargs['batch_size'])
+                elapsed = time.perf_counter() - start
+                added = model.objects.count() - before
+                transaction.on_commit(self.references[model].bump)
+                self.stdout.write(
+                    f'Данные добавлены в таблицу recipes_{file_name}: '
+                    f'прочитано {total}, добавлено {added}, '
+                    f'{total / elapsed if elapsed else total:.0f} строк/с')
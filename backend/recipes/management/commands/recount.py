@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import F, Max
+
+from recipes.cache import bump_ranking_version
+from recipes.models import Favorite, Recipe, Shopping, count_of
+from users.models import Subscribe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт счётчиков Рецептов и Пользователей.
+    Счётчики меняются через F() в представлениях (число Рецептов - в
+    сигналах Recipe), но могут разойтись с данными (каскадное удаление,
+    правки в админке, bulk-загрузка).
+    Команда проходит таблицы пачками по первичному ключу и исправляет
+    только расходящиеся значения.
+    Использование:
+    python manage.py recount [--batch_size 1000]
+    """
+
+    help = 'Пересчёт счётчиков избранного, покупок, рецептов и подписчиков'
+
+    counters = (
+        (Recipe, 'favorites_count', Favorite, 'recipe'),
+        (Recipe, 'shopping_count', Shopping, 'recipe'),
+        (User, 'recipes_count', Recipe, 'author'),
+        (User, 'subscribers_count', Subscribe, 'author'),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-bs', '--batch_size', type=int, default=1000,
+            help="Количество строк в одной пачке")
+
+    def recount(self, model, field, related_model, related_field, batch_size):
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        fixed = 0
+        for start in range(0, last_pk + 1, batch_size):
+            drifted = list(model.objects.filter(
+                pk__gte=start, pk__lt=start + batch_size
+            ).order_by().annotate(
+                actual=count_of(related_model, related_field)
+            ).exclude(
+                **{field: F('actual')}
+            ).values_list('pk', flat=True))
+            if drifted:
+                model.objects.filter(pk__in=drifted).update(
+                    **{field: count_of(related_model, related_field)})
+            fixed += len(drifted)
+        return fixed
+
+    def handle(self, *args, **kwargs):
+        for model, field, related_model, related_field in self.counters:
+            fixed = self.recount(
+                model, field, related_model, related_field,
+                kwargs['batch_size'])
+            self.stdout.write(
+                f'{model._meta.db_table}.{field}: исправлено {fixed}')
+        bump_ranking_version()
@@ -0,0 +1,110 @@
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.cache import bump_ranking_version
+from recipes.models import Favorite, Recipe, Shopping
+
+# Точка отсчёта балла: события после неё дают положительный вклад,
+# поэтому нулевой балл означает «нет активности».
+TRENDING_EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+# Вес события каждого типа в балле популярности.
+TRENDING_WEIGHTS = (
+    (Favorite, 1.0),
+    (Shopping, 0.5),
+)
+
+
+def event_score(created, weight, half_life):
+    """Вклад события в балл: log2(weight * 2^(возраст от эпохи / период))."""
+    age = (created - TRENDING_EPOCH).total_seconds() / half_life
+    return math.log2(weight) + age
+
+
+def log2_add(left, right):
+    """log2(2^left + 2^right) без переполнения."""
+    high, low = max(left, right), min(left, right)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт балла trending_score для сортировки ?ordering=trending.
+    Балл - сумма весов Избранного и Покупок, затухающая вдвое каждые
+    TRENDING_HALF_LIFE_HOURS часов. Все баллы затухают одинаково, поэтому
+    в таблице хранится log2 суммы, отсчитанной от постоянной эпохи:
+    порядок Рецептов тот же, а старые баллы не нужно переписывать.
+    Без --full учитываются только события после прошлого запуска и
+    обновляются только затронутые Рецепты. Удалённые из Избранного и
+    Покупок записи учитываются только полным пересчётом (--full), его
+    стоит запускать реже, например раз в сутки.
+    Использование:
+    python manage.py refresh_scores [--full] [--batch_size 1000]
+    """
+
+    help = 'Пересчёт балла популярности Рецептов за последнее время'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Пересчитать баллы всех Рецептов заново")
+        parser.add_argument(
+            '-bs', '--batch_size', type=int, default=1000,
+            help="Количество строк в одной пачке")
+
+    def collect(self, since, until, half_life):
+        scores = {}
+        for model, weight in TRENDING_WEIGHTS:
+            events = model.objects.filter(created__lte=until)
+            if since is not None:
+                events = events.filter(created__gt=since)
+            rows = events.order_by().values_list(
+                'recipe_id', 'created').iterator()
+            for recipe_id, created in rows:
+                score = event_score(created, weight, half_life)
+                if recipe_id in scores:
+                    score = log2_add(scores[recipe_id], score)
+                scores[recipe_id] = score
+        return scores
+
+    def save(self, scores, now, batch_size, merge):
+        ids = list(scores)
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            recipes = list(Recipe.objects.filter(pk__in=batch).only(
+                'id', 'trending_score', 'trending_updated'))
+            for recipe in recipes:
+                score = scores[recipe.pk]
+                if merge and recipe.trending_score:
+                    score = log2_add(recipe.trending_score, score)
+                recipe.trending_score = score
+                recipe.trending_updated = now
+            Recipe.objects.bulk_update(
+                recipes, ['trending_score', 'trending_updated'])
+
+    def handle(self, *args, **kwargs):
+        half_life = settings.TRENDING_HALF_LIFE_HOURS * 3600
+        now = timezone.now()
+        full = kwargs['full']
+        with transaction.atomic():
+            since = None
+            if not full:
+                since = Recipe.objects.aggregate(
+                    last=Max('trending_updated'))['last']
+            if since is None:
+                full = True
+            scores = self.collect(since, now, half_life)
+            if full:
+                Recipe.objects.update(trending_score=0, trending_updated=now)
+            self.save(scores, now, kwargs['batch_size'], merge=not full)
+        # Порядок ?ordering=trending в ETag и кэше ответов устарел.
+        bump_ranking_version()
+        self.stdout.write(
+            f'{"Полный" if full else "Частичный"} пересчёт: '
+            f'обновлено рецептов {len(scores)}')
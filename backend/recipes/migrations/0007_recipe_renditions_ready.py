@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Уменьшенные копии изображения готовы'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+FILL_AND_INDEX = (
+    "UPDATE recipes_recipe r SET search_vector = "
+    "setweight(to_tsvector('russian', coalesce(r.name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(("
+    "SELECT string_agg(i.name, ' ') FROM recipes_recipeingredient ri "
+    "JOIN recipes_ingredient i ON i.id = ri.ingredient_id "
+    "WHERE ri.recipe_id = r.id), '')), 'B') || "
+    "setweight(to_tsvector('russian', coalesce(r.text, '')), 'C')",
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector '
+    'ON recipes_recipe USING gin (search_vector)',
+)
+
+DROP_INDEX = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector',
+)
+
+
+def run_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_postgresql(FILL_AND_INDEX), run_postgresql(DROP_INDEX)),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipetag',
+            options={'ordering': ['id'], 'verbose_name': 'Тэги для Рецепта', 'verbose_name_plural': 'Тэги для Рецептов'},
+        ),
+    ]
@@ -1,5 +1,21 @@
-from django.shortcuts import get_object_or_404
-from rest_framework import mixins, viewsets
+import hashlib
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import mixins, serializers, viewsets
+from rest_framework.response import Response
+
+from .cache import (bump_ranking_version, bump_viewer_version, content_version,
+                    ingredient_reference, request_versions, response_cache_key,
+                    tag_reference, viewer_version, wait_for)
+from .models import Recipe, count_of
+from .serializers import BulkIdsSerializer
 
 
 class ListRetrieveModelViewSet(
@@ -10,19 +26,267 @@ class ListRetrieveModelViewSet(
     pass
 
 
+class ReferenceCacheMixin:
+    """
+    Чтение справочника через ReferenceCache.
+    Без фильтров список отдаётся готовыми данными из кэша, объект -
+    по pk из кэша. Ответы несут ETag/Last-Modified по версии справочника,
+    при совпадении отдаётся 304 без обращения к данным.
+    """
+
+    reference = None
+
+    def conditional_response(self, request, handler):
+        version = self.reference.version()
+        etag = self.reference.etag(version)
+        last_modified = version // 1000
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(self.reference.load(version))
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        def handler(reference):
+            queryset = self.get_queryset()
+            filtered = self.filter_queryset(queryset)
+            if filtered is queryset:
+                return Response(reference.data)
+            serializer = self.get_serializer(filtered, many=True)
+            return Response(serializer.data)
+        return self.conditional_response(request, handler)
+
+    def retrieve(self, request, *args, **kwargs):
+        def handler(reference):
+            try:
+                obj = reference.by_id[int(kwargs[self.lookup_field])]
+            except (KeyError, ValueError):
+                raise Http404
+            return Response(self.reference.to_representation(obj))
+        return self.conditional_response(request, handler)
+
+
+class AnonymousCacheMixin:
+    """
+    Общий кэш ответов list/retrieve для анонимов: отметки пользователя
+    у них всегда False, ответы одинаковы. Ключ - response_cache_key
+    под версией контента, которую сдвигают сигналы, а для
+    ?ordering=popular/trending ещё и под версией порядка, которую
+    сдвигают изменения счётчиков (update_counter). Истёкший ключ
+    пересобирает один запрос, остальные ждут его результат (не дольше
+    RESPONSE_CACHE_LOCK_TIMEOUT). Вместе с данными хранятся ETag и
+    Last-Modified, так что 304 из кэша отдаётся без запросов к базе.
+    """
+
+    cached_headers = ('ETag', 'Last-Modified')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, partial(super().retrieve, request, *args, **kwargs))
+
+    def cached_response(self, request, handler):
+        if (not request.user.is_anonymous
+                or not settings.RESPONSE_CACHE_TIMEOUT):
+            return handler()
+        key = response_cache_key(request)
+        cached = cache.get(key)
+        locked = False
+        if cached is None:
+            locked = cache.add(
+                f'{key}:lock', True, settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+            if not locked:
+                cached = wait_for(key, settings.RESPONSE_CACHE_LOCK_TIMEOUT)
+        if cached is None:
+            return self.build_response(key, handler, locked)
+        headers = cached['headers']
+        response = get_conditional_response(
+            request, etag=headers.get('ETag'),
+            last_modified=parse_http_date_safe(
+                headers.get('Last-Modified', '')))
+        if response is None:
+            return Response(cached['data'], headers=headers)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    def build_response(self, key, handler, locked):
+        """
+        Ответ handler() в кэш. Блокировку снимает только запрос, который
+        её взял: не дождавшийся ответа не освобождает чужую.
+        """
+        try:
+            response = handler()
+            if response.status_code == 200:
+                cache.set(key, {
+                    'data': response.data,
+                    'headers': {
+                        header: response[header]
+                        for header in self.cached_headers if header in response
+                    },
+                }, settings.RESPONSE_CACHE_TIMEOUT)
+        finally:
+            if locked:
+                cache.delete(f'{key}:lock')
+        return response
+
+
+class ConditionalRecipeMixin:
+    """
+    Условный GET списка и Рецепта по ETag, посчитанному без сериализации.
+    Для списка - слабый ETag из версий контента и порядка по счётчикам
+    (request_versions) и параметров запроса, без запросов к базе, для
+    Рецепта - сильный ETag из его updated и полей автора из ответа
+    (профиль меняется без updated Рецепта). В оба входят версии
+    справочников и отметок пользователя (Избранное, Покупки, Подписки).
+    При совпадении If-None-Match отдаётся 304 без выборки Рецептов.
+    Last-Modified отдаётся только анонимам: отметки пользователя
+    в updated не видны. Для Рецепта он не раньше версии контента,
+    которую сдвигает и правка профиля автора.
+    """
+
+    author_fields = (
+        'author__email', 'author__username',
+        'author__first_name', 'author__last_name',
+    )
+
+    def etag_digest(self, request, *parts):
+        source = (
+            request.build_absolute_uri('/'),
+            request.user.pk,
+            viewer_version(request.user),
+            tag_reference.version(),
+            ingredient_reference.version(),
+        ) + parts
+        return hashlib.md5(repr(source).encode('utf-8')).hexdigest()
+
+    def conditional_response(self, request, etag, modified, handler):
+        last_modified = None
+        if request.user.is_anonymous:
+            last_modified = modified
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler()
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        versions = request_versions(request)
+        digest = self.etag_digest(
+            request, versions, sorted(request.query_params.lists()))
+        return self.conditional_response(
+            request, f'W/"{digest}"', max(versions) // 1000,
+            partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            pk = int(kwargs[self.lookup_field])
+        except ValueError:
+            raise Http404
+        state = Recipe.objects.filter(pk=pk).values_list(
+            'updated', *self.author_fields).first()
+        if state is None:
+            raise Http404
+        updated = state[0]
+        digest = self.etag_digest(request, pk, state)
+        return self.conditional_response(
+            request, f'"{digest}"',
+            max(int(updated.timestamp()), content_version() // 1000),
+            partial(super().retrieve, request, *args, **kwargs))
+
+
 class LikeRecipeMixin:
+    """
+    Добавление/ удаление Рецепта в Избранное или Список покупок.
+    Счётчик на Рецепте (model_class.recipe_counter) меняется
+    в той же транзакции через F(), при удалении - только для реально
+    удалённых строк: параллельные DELETE не уменьшат его дважды.
+    При массовом добавлении он пересчитывается одним UPDATE.
+    """
+
+    def update_counter(self, model_class, ids, delta):
+        field = model_class.recipe_counter
+        Recipe.objects.filter(pk__in=ids).update(**{field: F(field) + delta})
+        transaction.on_commit(bump_ranking_version)
 
     def like(self, request, pk, serializer_class):
         data = {'owner': request.user.id, 'recipe': pk}
         context = {"request": request}
         serializer = serializer_class(data=data, context=context)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            self.update_counter(serializer_class.Meta.model, [pk], 1)
+            transaction.on_commit(
+                partial(bump_viewer_version, request.user.id))
         return serializer.data
 
+    def get_bulk_ids(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['ids']
+
+    def recount(self, model_class, ids):
+        field = model_class.recipe_counter
+        Recipe.objects.filter(pk__in=ids).update(
+            **{field: count_of(model_class, 'recipe')})
+        transaction.on_commit(bump_ranking_version)
+
+    def like_many(self, request, model_class):
+        """
+        Добавление списка Рецептов одним INSERT ... ON CONFLICT DO NOTHING:
+        уже добавленные пропускаются без ошибки.
+        """
+        ids = self.get_bulk_ids(request)
+        found = set(Recipe.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True))
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                {'ids': [f'Рецепты не найдены: {missing}']})
+        with transaction.atomic():
+            model_class.objects.bulk_create(
+                [model_class(owner=request.user, recipe_id=pk) for pk in ids],
+                ignore_conflicts=True)
+            self.recount(model_class, ids)
+            transaction.on_commit(
+                partial(bump_viewer_version, request.user.id))
+        return {'ids': ids}
+
+    def unlike_many(self, request, model_class):
+        """
+        Удаление списка Рецептов одним DELETE ... WHERE recipe_id IN.
+        Строки сначала блокируются: параллельный запрос на те же Рецепты
+        дождётся коммита и не найдёт их, счётчики уменьшатся один раз.
+        """
+        ids = self.get_bulk_ids(request)
+        with transaction.atomic():
+            rows = model_class.objects.filter(
+                owner=request.user, recipe_id__in=ids)
+            deleted_ids = list(rows.select_for_update().values_list(
+                'recipe_id', flat=True))
+            if not deleted_ids:
+                raise serializers.ValidationError(
+                    {'ids': ['Ни одного из Рецептов нет в списке.']})
+            rows.filter(recipe_id__in=deleted_ids).delete()
+            self.update_counter(model_class, deleted_ids, -1)
+            transaction.on_commit(
+                partial(bump_viewer_version, request.user.id))
+
     def unlike(self, request, pk, model_class):
-        get_object_or_404(
-            model_class,
-            owner=request.user,
-            recipe=pk
-        ).delete()
+        with transaction.atomic():
+            deleted, _ = model_class.objects.filter(
+                owner=request.user, recipe=pk).delete()
+            if not deleted:
+                raise Http404
+            self.update_counter(model_class, [pk], -deleted)
+            transaction.on_commit(
+                partial(bump_viewer_version, request.user.id))
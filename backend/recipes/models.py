@@ -1,14 +1,33 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import (BooleanField, Count, Exists, IntegerField,
+                              OuterRef, Prefetch, Subquery, Value)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.html import format_html
 from pytils.translit import slugify
 
+from users.models import Subscribe
+
 from .fields import ColorField
 
 User = get_user_model()
 
 
+def count_of(model, field):
+    """Подзапрос: число строк model, ссылающихся на текущую запись."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
 class Tag(models.Model):
     """Тэги."""
     name = models.CharField(
@@ -65,11 +84,50 @@ class Ingredient(models.Model):
         verbose_name = 'Продукт'
         verbose_name_plural = 'Продукты'
         ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_measurement_unit'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Выборка Рецептов со связанными данными для сериализации."""
+
+    def with_related(self):
+        return self.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+    def with_user_flags(self, user):
+        """Отметки Избранного, Списка покупок и Подписки для user."""
+        if user is None or user.is_anonymous:
+            false = Value(False, output_field=BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                is_subscribed=false,
+            )
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                owner=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(Shopping.objects.filter(
+                owner=user, recipe=OuterRef('pk'))),
+            is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+
 class Recipe(models.Model):
     """Рецепты."""
     author = models.ForeignKey(
@@ -92,6 +150,11 @@ class Recipe(models.Model):
         help_text='Загрузите изображение',
         upload_to='recipes/'
     )
+    renditions_ready = models.BooleanField(
+        verbose_name='Уменьшенные копии изображения готовы',
+        default=False,
+        editable=False,
+    )
     tags = models.ManyToManyField(
         'Tag',
         verbose_name='Тэги',
@@ -111,11 +174,62 @@ class Recipe(models.Model):
         default=1,
         validators=[MinValueValidator(1, message='Минимальное значение - 1')],
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    shopping_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False,
+    )
+    trending_score = models.FloatField(
+        verbose_name='Популярность за последнее время',
+        default=0,
+        editable=False,
+    )
+    trending_updated = models.DateTimeField(
+        verbose_name='Популярность пересчитана',
+        null=True,
+        editable=False,
+    )
+    created = models.DateTimeField(
+        verbose_name='Создан',
+        auto_now_add=True,
+        db_index=True,
+    )
+    updated = models.DateTimeField(
+        verbose_name='Изменён',
+        auto_now=True,
+        db_index=True,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-id']
+        indexes = [
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=['-trending_score', '-id'],
+                name='recipe_trending_idx'
+            ),
+            models.Index(
+                fields=['cooking_time', '-id'],
+                name='recipe_cooking_time_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'{self.name[:15]}, {self.author.username[:15]}'
@@ -184,6 +298,8 @@ class RecipeTag(models.Model):
 
 class Favorite(models.Model):
     """Избранные рецепты."""
+    recipe_counter = 'favorites_count'
+
     owner = models.ForeignKey(
         User,
         verbose_name='Хозяин',
@@ -197,6 +313,11 @@ class Favorite(models.Model):
         related_name='favorites',
         on_delete=models.CASCADE
     )
+    created = models.DateTimeField(
+        verbose_name='Добавлено',
+        default=timezone.now,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'Избранное'
@@ -215,6 +336,8 @@ class Favorite(models.Model):
 
 class Shopping(models.Model):
     """Список покупок."""
+    recipe_counter = 'shopping_count'
+
     owner = models.ForeignKey(
         User,
         verbose_name='Хозяин',
@@ -228,6 +351,11 @@ class Shopping(models.Model):
         related_name='shoppings',
         on_delete=models.CASCADE
     )
+    created = models.DateTimeField(
+        verbose_name='Добавлено',
+        default=timezone.now,
+        db_index=True,
+    )
 
     class Meta:
         verbose_name = 'Покупку'
@@ -1,6 +1,153 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Ниже этого числа строк оценке pg_class не доверяем и считаем точно.
+ESTIMATE_MIN_ROWS = 1000
+
+
+def estimated_count(queryset):
+    """
+    Приблизительное число строк без COUNT(*) на каждый запрос.
+    Для таблицы без фильтров - оценка планировщика из pg_class.reltuples,
+    для остальных выборок - точный COUNT, закэшированный на
+    PAGINATION_COUNT_TIMEOUT секунд.
+    """
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= ESTIMATE_MIN_ROWS:
+            return row[0]
+    sql, params = queryset.order_by().query.sql_with_params()
+    key = hashlib.md5(f'{sql}{params}'.encode('utf-8')).hexdigest()
+    return cache.get_or_set(
+        f'count:{key}', queryset.count, settings.PAGINATION_COUNT_TIMEOUT)
+
+
+class RecipesCursorPagination(CursorPagination):
+    """
+    Постраничный вывод по ключу без OFFSET и точного COUNT.
+    Курсор DRF хранит только первое поле сортировки, а Рецепты с равным
+    значением пропускает смещением не дальше offset_cutoff: при
+    неуникальном ключе (?ordering=popular, релевантность поиска) страницы
+    повторяются и теряют Рецепты. Поэтому ключом бывает только id
+    (по умолчанию -id), другая сортировка выборки заменяется на -id.
+    """
+
+    unique_orderings = ('id', '-id', 'pk', '-pk')
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    ordering = '-id'
+
+    @classmethod
+    def is_unique(cls, queryset):
+        ordering = queryset.query.order_by
+        return not ordering or ordering[0] in cls.unique_orderings
+
+    def get_ordering(self, request, queryset, view):
+        if queryset.query.order_by and self.is_unique(queryset):
+            return tuple(queryset.query.order_by)
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = estimated_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class CookPagination(PageNumberPagination):
+    """Постраничный вывод готового списка подбора Рецептов по продуктам."""
+
+    page_size = 6
+    page_size_query_param = 'limit'
 
 
 class RecipesPageNumberPagination(PageNumberPagination):
+    """
+    Постраничный вывод по номеру страницы.
+    С параметром cursor (для первой страницы - пустым: ?cursor=)
+    переключается на RecipesCursorPagination, если выборка упорядочена
+    по id. Другие сортировки (?ordering=, поиск) остаются постраничными
+    по номеру: курсор по неуникальному ключу теряет Рецепты.
+    """
+
     page_size = 6
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_query_param in request.query_params
+                and RecipesCursorPagination.is_unique(queryset)):
+            self.cursor_paginator = RecipesCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class FeedPagination(BasePagination):
+    """
+    Постраничный вывод ленты по ключу: ?before=<id> - Рецепты старше
+    указанного, ссылка next ведёт от последнего Рецепта страницы.
+    Страница собирается из id, поэтому пагинатор работает с функцией
+    fetch(before, limit), а не с выборкой.
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    before_query_param = 'before'
+
+    def get_int_param(self, request, name):
+        try:
+            value = int(request.query_params[name])
+        except (KeyError, ValueError):
+            return None
+        return value if value > 0 else None
+
+    def paginate_ids(self, fetch, request):
+        limit = min(
+            self.get_int_param(request, self.page_size_query_param)
+            or self.page_size,
+            self.max_page_size)
+        before = self.get_int_param(request, self.before_query_param)
+        ids = fetch(before, limit + 1)
+        self.request = request
+        self.has_next = len(ids) > limit
+        return ids[:limit]
+
+    def get_next_link(self, ids):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.before_query_param, ids[-1])
+
+    def get_paginated_response(self, data, ids):
+        return Response(OrderedDict([
+            ('next', self.get_next_link(ids)),
+            ('results', data),
+        ]))
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+import os
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+SHOPPING_CART_TITLE = 'Список продуктов для выбранных рецептов:'
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingCartRendererMixin(ABC):
+    """
+    Потоковая выгрузка Списка покупок.
+    stream() получает итератор строк вида
+    {'ingredient__name', 'ingredient__measurement_unit', 'sum_amount'}
+    и отдаёт документ по частям.
+    render() нужен только для ответов с ошибками.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    @abstractmethod
+    def stream(self, ingredients):
+        """Итератор частей документа (str или bytes)."""
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRendererMixin, BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def stream(self, ingredients):
+        csv_writer = csv.writer(
+            Echo(), delimiter=',', lineterminator='\n',
+            quoting=csv.QUOTE_NONNUMERIC)
+        yield csv_writer.writerow([
+            ' ', ' ', 'СПИСОК ПРОДУКТОВ для ', 'выбранных ', 'рецептов:'
+        ])
+        yield csv_writer.writerow(['-', '-', '-', '-', '-'])
+        for num, ingredient in enumerate(ingredients, start=1):
+            prod = ingredient['ingredient__name'] + ': '
+            amount = ingredient['sum_amount']
+            unit = ingredient['ingredient__measurement_unit']
+            yield csv_writer.writerow([num, '. ', prod, amount, unit])
+
+
+class ShoppingCartTXTRenderer(ShoppingCartRendererMixin, BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def stream(self, ingredients):
+        yield f'{SHOPPING_CART_TITLE}\n\n'
+        for num, ingredient in enumerate(ingredients, start=1):
+            yield (
+                f'{num}. {ingredient["ingredient__name"]} '
+                f'({ingredient["ingredient__measurement_unit"]}) - '
+                f'{ingredient["sum_amount"]}\n'
+            )
+
+
+class ShoppingCartJSONRenderer(JSONRenderer):
+    format = 'json'
+
+    def stream(self, ingredients):
+        yield '['
+        for num, ingredient in enumerate(ingredients):
+            yield (',' if num else '') + json.dumps({
+                'name': ingredient['ingredient__name'],
+                'measurement_unit': ingredient['ingredient__measurement_unit'],
+                'amount': ingredient['sum_amount'],
+            }, ensure_ascii=False)
+        yield ']'
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRendererMixin, BaseRenderer):
+    """
+    PDF собирается reportlab построчно по мере чтения курсора,
+    готовый документ отдаётся частями по chunk_size байт.
+    Для кириллицы нужен TTF-шрифт из settings.SHOPPING_CART_PDF_FONT.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    render_style = 'binary'
+    chunk_size = 64 * 1024
+    font_name = 'ShoppingCartFont'
+
+    def get_font(self):
+        font_path = settings.SHOPPING_CART_PDF_FONT
+        if not os.path.exists(font_path):
+            return 'Helvetica'
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(self.font_name, font_path))
+        return self.font_name
+
+    def stream(self, ingredients):
+        font = self.get_font()
+        _, height = A4
+        line_height = 0.7 * cm
+        out = io.BytesIO()
+        pdf = canvas.Canvas(out, pagesize=A4)
+        pdf.setFont(font, 14)
+        top = height - 2 * cm
+        pdf.drawString(2 * cm, top, SHOPPING_CART_TITLE)
+        pdf.setFont(font, 12)
+        y = top - 2 * line_height
+        for num, ingredient in enumerate(ingredients, start=1):
+            if y < 2 * cm:
+                pdf.showPage()
+                pdf.setFont(font, 12)
+                y = top
+            pdf.drawString(
+                2 * cm, y,
+                f'{num}. {ingredient["ingredient__name"]} '
+                f'({ingredient["ingredient__measurement_unit"]}) - '
+                f'{ingredient["sum_amount"]}'
+            )
+            y -= line_height
+        pdf.save()
+        out.seek(0)
+        yield from iter(lambda: out.read(self.chunk_size), b'')
@@ -0,0 +1,224 @@
+import heapq
+import logging
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import Lock, Thread
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import (Case, F, IntegerField, OuterRef, Q, Subquery,
+                              TextField, Value, When)
+from django.db.models.functions import Lower
+
+from .cache import bump_version, get_version, ingredient_reference
+from .models import RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+TRIGRAM_MIN_LENGTH = 3
+
+# Конфигурация полнотекстового поиска PostgreSQL для Рецептов.
+SEARCH_CONFIG = 'russian'
+
+
+def search_ingredients(queryset, name, limit):
+    """
+    Автодополнение Продуктов по названию через индексы PostgreSQL.
+    Совпадения по началу названия идут раньше совпадений по вхождению.
+    Короткие запросы ищутся только по началу (индекс text_pattern_ops
+    на lower(name)), длинные - по вхождению (GIN-индекс pg_trgm).
+    """
+    queryset = queryset.annotate(name_lower=Lower('name'))
+    if len(name) < TRIGRAM_MIN_LENGTH:
+        return queryset.filter(
+            name_lower__startswith=name
+        ).order_by('name_lower')[:limit]
+    return queryset.filter(
+        name_lower__contains=name
+    ).annotate(
+        is_substring=Case(
+            When(name_lower__startswith=name, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    ).order_by('is_substring', 'name_lower')[:limit]
+
+
+class IngredientIndex:
+    """
+    Индекс Продуктов в памяти процесса: отсортированный массив названий.
+    Поиск по началу - бинарный поиск, по вхождению - проход по массиву.
+    Строится по справочнику из ingredient_reference и перестраивается,
+    когда сигналы Ingredient сдвигают его версию.
+    """
+
+    def __init__(self, reference):
+        self.reference = reference
+        self.lock = Lock()
+        self.version = None
+        self.names = []
+        self.items = []
+
+    def get(self):
+        reference = self.reference.get()
+        with self.lock:
+            if self.version != reference.version:
+                pairs = sorted(
+                    ((obj.name.lower(), obj.id), obj)
+                    for obj in reference.objects
+                )
+                self.names = [key[0] for key, _ in pairs]
+                self.items = [obj for _, obj in pairs]
+                self.version = reference.version
+            return self.names, self.items
+
+    def search(self, name, limit):
+        names, items = self.get()
+        found = []
+        start = bisect_left(names, name)
+        for pos in range(start, len(names)):
+            if len(found) >= limit or not names[pos].startswith(name):
+                break
+            found.append(pos)
+        if len(found) < limit and len(name) >= TRIGRAM_MIN_LENGTH:
+            prefixed = set(found)
+            for pos, item_name in enumerate(names):
+                if len(found) >= limit:
+                    break
+                if pos not in prefixed and name in item_name:
+                    found.append(pos)
+        return [items[pos] for pos in found]
+
+
+ingredient_index = IngredientIndex(ingredient_reference)
+
+
+class RecipeIngredientIndex:
+    """
+    Обратный индекс продукт -> Рецепты в памяти процесса для подбора
+    Рецептов по продуктам в наличии: для каждого продукта - массив id
+    Рецептов, для каждого Рецепта - число его продуктов. Поиск считает
+    совпадения по массивам запрошенных продуктов, без GROUP BY в базе.
+    Сигналы Recipe сдвигают версию индекса, он перестраивается
+    не чаще раза в COOK_INDEX_MAX_AGE секунд в фоновом потоке, а запросы
+    тем временем читают предыдущий снимок. Синхронно строится только
+    первый снимок процесса.
+    """
+
+    version_key = 'cook_index:version'
+
+    def __init__(self):
+        self.lock = Lock()
+        self.version = None
+        self.built = 0.0
+        self.building = False
+        self.snapshot = None
+
+    def bump(self):
+        bump_version(self.version_key, None)
+
+    def get(self):
+        """Снимок (postings, sizes); устаревший отдаётся до пересборки."""
+        version = get_version(self.version_key, None)
+        with self.lock:
+            if self.snapshot is None:
+                self.build(version)
+            expired = (
+                time.monotonic() - self.built >= settings.COOK_INDEX_MAX_AGE)
+            if self.version != version and expired and not self.building:
+                self.building = True
+                Thread(
+                    target=self.rebuild, args=(version,),
+                    name='cook-index', daemon=True).start()
+            return self.snapshot
+
+    def build(self, version):
+        postings = defaultdict(lambda: array('L'))
+        sizes = Counter()
+        rows = RecipeIngredient.objects.order_by().values_list(
+            'ingredient_id', 'recipe_id').iterator()
+        for ingredient_id, recipe_id in rows:
+            postings[ingredient_id].append(recipe_id)
+            sizes[recipe_id] += 1
+        self.snapshot = (dict(postings), dict(sizes))
+        self.version = version
+        self.built = time.monotonic()
+
+    def rebuild(self, version):
+        try:
+            self.build(version)
+        except Exception:
+            logger.exception('Не удалось перестроить индекс продуктов')
+            self.built = time.monotonic()
+        finally:
+            self.building = False
+            connection.close()
+
+    def search(self, ingredient_ids, max_missing=None):
+        """
+        До COOK_RESULTS_LIMIT Рецептов с запрошенными продуктами:
+        кортежи (id, совпало продуктов, всего продуктов) по убыванию доли
+        совпавших, затем по числу недостающих и новизне. max_missing
+        отсекает Рецепты, где не хватает больше max_missing продуктов.
+        """
+        postings, sizes = self.get()
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        found = (
+            (recipe_id, count, sizes[recipe_id])
+            for recipe_id, count in matched.items()
+            if max_missing is None or sizes[recipe_id] - count <= max_missing
+        )
+        return heapq.nlargest(
+            settings.COOK_RESULTS_LIMIT, found,
+            key=lambda item: (item[1] / item[2], item[1] - item[2], item[0]))
+
+
+cook_index = RecipeIngredientIndex()
+
+
+def recipe_search_vector():
+    """
+    tsvector Рецепта: название (вес A), названия продуктов (B)
+    и описание (C).
+    """
+    ingredient_names = RecipeIngredient.objects.filter(
+        recipe=OuterRef('pk')
+    ).order_by().values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(
+            Subquery(ingredient_names, output_field=TextField()),
+            weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipes):
+    """Пересчёт search_vector выборки Рецептов одним UPDATE."""
+    if connection.vendor != 'postgresql':
+        return
+    recipes.update(search_vector=recipe_search_vector())
+
+
+def search_recipes(queryset, text):
+    """
+    Полнотекстовый поиск Рецептов по GIN-индексу search_vector,
+    более релевантные первыми. Без PostgreSQL - поиск по вхождению
+    в название и описание.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.filter(
+            Q(name__icontains=text) | Q(text__icontains=text))
+    query = SearchQuery(text, config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-id')
@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
 from rest_framework import serializers
 
-from users.serializers import ProfileSerializer
-
+from .cache import get_viewer_state, ingredient_reference, tag_reference
+from .fields import Base64ImageField
+from .images import rendition_urls, schedule_renditions
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient, Shopping,
                      Tag)
 
@@ -18,11 +20,31 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
+class ReferencePrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Объект справочника по pk из ReferenceCache, без запроса в базу"""
+
+    def __init__(self, reference, **kwargs):
+        self.reference = reference
+        kwargs.setdefault('queryset', reference.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.reference.get().by_id.get(pk)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
 class AddIngredientSerializer(serializers.ModelSerializer):
     """Добавление ингредиентов в Рецепт"""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all())
+    id = ReferencePrimaryKeyRelatedField(ingredient_reference)
     amount = serializers.IntegerField()
 
     class Meta:
@@ -38,61 +60,86 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
-class RecipeIngredientAmountSerializer(serializers.ModelSerializer):
-    """Получение списка Продуктов Рецепта с количеством"""
+class RecipeSerializer(serializers.BaseSerializer):
+    """Получение списка Рецептов/ Рецепта (только чтение).
 
-    id = serializers.ReadOnlyField(source='ingredient.id')
-    name = serializers.ReadOnlyField(source='ingredient.name')
-    measurement_unit = serializers.ReadOnlyField(
-        source='ingredient.measurement_unit')
+    Представление собирается словарями без вложенных сериализаторов:
+    Тэги и Продукты берутся из prefetch, отметки пользователя -
+    из аннотаций RecipeQuerySet.with_user_flags, а без них -
+    из ViewerState запроса.
+    """
 
-    class Meta:
-        model = RecipeIngredient
-        fields = ('id', 'name', 'measurement_unit', 'amount')
-
-
-class RecipeSerializer(serializers.ModelSerializer):
-    """Получение списка Рецептов/ Рецепта"""
-
-    tags = TagSerializer(many=True)
-    author = ProfileSerializer()
-    ingredients = serializers.SerializerMethodField()
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    def to_representation(self, obj):
+        author = obj.author
+        return {
+            'id': obj.id,
+            'tags': [
+                {
+                    'id': tag.id,
+                    'name': tag.name,
+                    'color': tag.color,
+                    'slug': tag.slug,
+                }
+                for tag in obj.tags.all()
+            ],
+            'author': {
+                'id': author.id,
+                'email': author.email,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'is_subscribed': self.get_is_subscribed(obj),
+            },
+            'ingredients': [
+                {
+                    'id': item.ingredient.id,
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in obj.recipe_ingredients.all()
+            ],
+            'is_favorited': self.get_is_favorited(obj),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(obj),
+            'name': obj.name,
+            'image': self.get_image(obj),
+            'image_renditions': rendition_urls(
+                obj, self.context.get('request')),
+            'text': obj.text,
+            'cooking_time': obj.cooking_time,
+        }
+
+    def get_image(self, obj):
+        if not obj.image:
+            return None
+        request = self.context.get('request')
+        if request is None:
+            return obj.image.url
+        return request.build_absolute_uri(obj.image.url)
 
-    class Meta:
-        model = Recipe
-        fields = (
-            'id',
-            'tags',
-            'author',
-            'ingredients',
-            'is_favorited',
-            'is_in_shopping_cart',
-            'name',
-            'image',
-            'text',
-            'cooking_time',
-        )
-        read_only_fields = [f.name for f in User._meta.get_fields()]
+    def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        request = self.context.get('request')
+        if not request:
+            return False
+        return obj.author_id in get_viewer_state(request).subscriptions
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
+        if not request:
             return False
-        return obj.favorites.filter(owner=request.user).exists()
+        return obj.id in get_viewer_state(request).favorites
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
+        if not request:
             return False
-        return obj.shoppings.filter(owner=request.user).exists()
-
-    def get_ingredients(self, obj):
-        return RecipeIngredientAmountSerializer(
-            RecipeIngredient.objects.filter(recipe=obj), many=True
-        ).data
+        return obj.id in get_viewer_state(request).shopping
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -103,9 +150,8 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         default=serializers.CurrentUserDefault()
     )
     ingredients = AddIngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True)
-    image = Base64ImageField()
+    tags = ReferencePrimaryKeyRelatedField(tag_reference, many=True)
+    image = Base64ImageField(required=False)
 
     class Meta:
         model = Recipe
@@ -120,10 +166,10 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
 
     def to_representation(self, obj):
-        return RecipeSerializer(
-            obj,
-            context={'request': self.context.get('request')}
-        ).data
+        request = self.context.get('request')
+        obj = Recipe.objects.with_related().with_user_flags(
+            request and request.user).get(pk=obj.pk)
+        return RecipeSerializer(obj, context={'request': request}).data
 
     def all_list_values_is_unique(self, data_list):
         return len(data_list) == len(set(data_list))
@@ -152,37 +198,87 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Тэги не должны повторяться.')
 
-        return data
+        if self.instance is None and not data.get('image'):
+            raise serializers.ValidationError(
+                {'image': 'Обязательное поле.'})
 
-    def add_tags(self, tags, recipe):
-        for tag in tags:
-            recipe.tags.add(tag)
+        return data
 
     def add_ingredients(self, ingredients, recipe):
-        for ingredient in ingredients:
-            RecipeIngredient.objects.create(
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
                 recipe=recipe,
                 ingredient=ingredient['id'],
                 amount=ingredient['amount']
             )
+            for ingredient in ingredients
+        ])
+
+    def update_ingredients(self, ingredients, recipe):
+        """Изменение Продуктов Рецепта по разнице со старым составом."""
+        current = {
+            item.ingredient_id: item
+            for item in recipe.recipe_ingredients.all()
+        }
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            item = current.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        self.add_ingredients(
+            [ingredient for ingredient in ingredients
+             if ingredient['id'].id not in current],
+            recipe
+        )
 
+    def reuse_renditions(self, validated_data):
+        """У уже загруженного файла копии могли быть построены раньше."""
+        image = validated_data['image']
+        validated_data['renditions_ready'] = (
+            isinstance(image, str) and Recipe.objects.filter(
+                image=image, renditions_ready=True).exists())
+
+    def schedule_renditions(self, recipe):
+        """Копии изображения строятся после коммита, запрос их не ждёт."""
+        if recipe.renditions_ready:
+            return
+        transaction.on_commit(
+            lambda: schedule_renditions(recipe.pk, recipe.image.name))
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        self.reuse_renditions(validated_data)
         recipe = Recipe.objects.create(**validated_data)
-        self.add_tags(tags, recipe)
+        recipe.tags.add(*tags)
         self.add_ingredients(ingredients, recipe)
+        self.schedule_renditions(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, obj, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
+        if validated_data.get('image', obj.image.name) == obj.image.name:
+            validated_data.pop('image', None)
+        else:
+            self.reuse_renditions(validated_data)
         super().update(obj, validated_data)
-        obj.tags.clear()
-        self.add_tags(tags, obj)
-        RecipeIngredient.objects.filter(recipe=obj).all().delete()
-        self.add_ingredients(ingredients, obj)
-        obj.save()
+        obj.tags.set(tags)
+        self.update_ingredients(ingredients, obj)
+        self.schedule_renditions(obj)
 
         return obj
 
@@ -190,9 +286,27 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 class RecipeSelectedSerializer(serializers.ModelSerializer):
     """Выбранные рецепты для Подписок и Списка покупок"""
 
+    image_renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'image', 'name', 'cooking_time',)
+        fields = ('id', 'image', 'image_renditions', 'name', 'cooking_time',)
+
+    def get_image_renditions(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для массового добавления/ удаления"""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS
+    )
+
+    def validate_ids(self, value):
+        return sorted(set(value))
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Subscribe
+
+from .cache import bump_content_version, ingredient_reference, tag_reference
+from .feed import invalidate_followers_timelines, invalidate_timeline
+from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .search import cook_index, update_search_vectors
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def bump_tag_reference(sender, **kwargs):
+    transaction.on_commit(tag_reference.bump)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def bump_ingredient_reference(sender, **kwargs):
+    transaction.on_commit(ingredient_reference.bump)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_feed_on_publish(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(
+            lambda: invalidate_followers_timelines(instance.author_id))
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_feed_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: invalidate_followers_timelines(instance.author_id))
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, raw=False, **kwargs):
+    """
+    Счётчик Рецептов автора меняется в транзакции записи Рецепта при
+    любом способе: API, админка, каскадное удаление пользователя.
+    """
+    if created and not raw:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    User.objects.filter(pk=instance.author_id).update(
+        recipes_count=F('recipes_count') - 1)
+
+
+@receiver([post_save, post_delete], sender=Subscribe)
+def invalidate_feed_on_subscribe(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_timeline(instance.user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    """
+    Продукты Рецепта меняются в той же транзакции после сохранения
+    Рецепта, поэтому вектор считается после коммита.
+    """
+    transaction.on_commit(
+        lambda: update_search_vectors(Recipe.objects.filter(pk=instance.pk)))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search_vector(sender, instance, created,
+                                            **kwargs):
+    if created:
+        return
+    transaction.on_commit(lambda: update_search_vectors(
+        Recipe.objects.filter(recipe_ingredients__ingredient=instance)))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def bump_cook_index(sender, **kwargs):
+    transaction.on_commit(cook_index.bump)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_content(sender, **kwargs):
+    transaction.on_commit(bump_content_version)
+
+
+@receiver([post_save, post_delete], sender=User)
+def bump_content_on_user(sender, update_fields=None, **kwargs):
+    """Вход пользователя сохраняет только last_login - контент тот же."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(bump_content_version)
@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from .models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+class RecipeListQueriesTest(APITestCase):
+    """
+    Число запросов списка Рецептов не зависит от размера страницы:
+    автор, тэги, продукты и отметки пользователя не грузятся
+    по одному на Рецепт.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            password='password', first_name='Имя', last_name='Фамилия')
+        tags = [
+            Tag.objects.create(
+                name=f'Тэг {i}', color=f'#00000{i}', slug=f'tag-{i}')
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {i}', measurement_unit='г')
+            for i in range(5)
+        ]
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {i}', text='Текст',
+                image='recipes/recipe.png', cooking_time=i + 1)
+            recipe.tags.set(tags[:i % 3 + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=10)
+                for ingredient in ingredients[:i % 5 + 1]
+            )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        for limit in (1, 5, 10):
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(7):
+                    response = self.client.get(
+                        '/api/recipes/', {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+
+class RecipeCursorPaginationTest(APITestCase):
+    """
+    Проход по всем страницам ?cursor= отдаёт каждый Рецепт ровно один
+    раз, даже когда у больше чем offset_cutoff Рецептов равный ключ
+    сортировки.
+    """
+
+    recipes = 1300
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            password='password', first_name='Имя', last_name='Фамилия')
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author, name=f'Рецепт {i}', text='Текст',
+                image='recipes/recipe.png', cooking_time=5)
+            for i in range(cls.recipes)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, params):
+        ids = []
+        url = '/api/recipes/'
+        for _ in range(self.recipes // params['limit'] + 1):
+            if url is None:
+                break
+            cache.clear()
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url, params = response.data['next'], None
+        self.assertIsNone(url, 'Последняя страница не достигнута')
+        return ids
+
+    def test_cursor_pages_cover_tied_recipes_once(self):
+        expected = sorted(Recipe.objects.values_list('id', flat=True))
+        for ordering in (None, 'popular', 'trending', 'cooking_time'):
+            with self.subTest(ordering=ordering):
+                params = {'cursor': '', 'limit': 100}
+                if ordering:
+                    params['ordering'] = ordering
+                ids = self.walk(params)
+                self.assertEqual(len(ids), len(set(ids)))
+                self.assertEqual(sorted(ids), expected)
+
+    def test_cursor_keeps_non_unique_ordering(self):
+        recipe = Recipe.objects.order_by('id').first()
+        Recipe.objects.filter(pk=recipe.pk).update(favorites_count=1)
+        response = self.client.get(
+            '/api/recipes/', {'cursor': '', 'ordering': 'popular'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['id'], recipe.pk)
@@ -1,21 +1,29 @@
-import csv
-import io
-
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Prefetch, Sum
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from users.permissions import IsAuthorOrAdminOrReadOnly
 
+from .cache import ingredient_reference, tag_reference
+from .feed import feed_page
 from .filters import IngredientSearchFilter, RecipeFilter
-from .mixins import LikeRecipeMixin, ListRetrieveModelViewSet
+from .mixins import (AnonymousCacheMixin, ConditionalRecipeMixin,
+                     LikeRecipeMixin, ListRetrieveModelViewSet,
+                     ReferenceCacheMixin)
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient, Shopping,
                      Tag)
-from .paginations import RecipesPageNumberPagination
+from .paginations import (CookPagination, FeedPagination,
+                          RecipesPageNumberPagination)
+from .renderers import (ShoppingCartCSVRenderer, ShoppingCartJSONRenderer,
+                        ShoppingCartPDFRenderer, ShoppingCartTXTRenderer)
+from .search import cook_index
 from .serializers import (FavoriteSerializer, IngredientSerializer,
                           RecipeCreateSerializer, RecipeSerializer,
                           ShoppingSerializer, TagSerializer)
@@ -23,33 +31,106 @@ from .serializers import (FavoriteSerializer, IngredientSerializer,
 User = get_user_model()
 
 
-class TagViewSet(ListRetrieveModelViewSet):
+class TagViewSet(ReferenceCacheMixin, ListRetrieveModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    reference = tag_reference
 
 
-class IngredientViewSet(ListRetrieveModelViewSet):
+class IngredientViewSet(ReferenceCacheMixin, ListRetrieveModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    reference = ingredient_reference
     filter_backends = [IngredientSearchFilter]
-    search_fields = ('^name',)
 
 
-class RecipeViewSet(LikeRecipeMixin, viewsets.ModelViewSet):
-    queryset = Recipe.objects.all().prefetch_related(Prefetch('tags')).all()
+class RecipeViewSet(AnonymousCacheMixin, ConditionalRecipeMixin,
+                    LikeRecipeMixin, viewsets.ModelViewSet):
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
     pagination_class = RecipesPageNumberPagination
 
+    def get_queryset(self):
+        return Recipe.objects.with_related()
+
     def get_serializer_class(self):
-        if self.request.method == 'list':
+        if self.action in ('list', 'retrieve', 'feed', 'cook'):
             return RecipeSerializer
         return RecipeCreateSerializer
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, permission_classes=[IsAuthenticated, ])
+    def feed(self, request):
+        """
+        Рецепты авторов из подписок, новые первыми. id страницы берутся
+        из закэшированной ленты, сами Рецепты - одним запросом с
+        предзагрузкой тэгов и продуктов.
+        """
+        paginator = FeedPagination()
+        ids = paginator.paginate_ids(
+            lambda before, limit: feed_page(request.user, before, limit),
+            request)
+        recipes = self.get_queryset().in_bulk(ids)
+        page = [recipes[pk] for pk in ids if pk in recipes]
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data, ids)
+
+    def get_cook_params(self):
+        params = self.request.query_params
+        try:
+            ingredient_ids = {
+                int(value)
+                for item in params.getlist('ingredients')
+                for value in item.split(',') if value.strip()
+            }
+            max_missing = params.get('missing')
+            if max_missing is not None:
+                max_missing = int(max_missing)
+        except ValueError:
+            raise ValidationError(
+                'ingredients и missing должны быть целыми числами')
+        if not ingredient_ids:
+            raise ValidationError('Укажите продукты: ?ingredients=1,2,3')
+        if len(ingredient_ids) > settings.COOK_MAX_INGREDIENTS:
+            raise ValidationError(
+                f'Не больше {settings.COOK_MAX_INGREDIENTS} продуктов')
+        if max_missing is not None and max_missing < 0:
+            raise ValidationError('missing не может быть отрицательным')
+        return ingredient_ids, max_missing
+
+    @action(detail=False)
+    def cook(self, request):
+        """
+        Что приготовить из продуктов ?ingredients=1,2,3: Рецепты по
+        убыванию доли имеющихся продуктов, с ?missing=K - только те,
+        где не хватает не больше K продуктов. Подбор идёт по обратному
+        индексу в памяти (search.RecipeIngredientIndex), из базы
+        загружается только текущая страница.
+        """
+        ingredient_ids, max_missing = self.get_cook_params()
+        paginator = CookPagination()
+        ranked = paginator.paginate_queryset(
+            cook_index.search(ingredient_ids, max_missing), request)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in ranked])
+        page = []
+        for recipe_id, matched, required in ranked:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.cook_stats = {
+                    'matched': matched,
+                    'missing': required - matched,
+                    'coverage': round(matched / required, 3),
+                }
+                page.append(recipe)
+        data = self.get_serializer(page, many=True).data
+        for item, recipe in zip(data, page):
+            item.update(recipe.cook_stats)
+        return paginator.get_paginated_response(data)
+
     @action(detail=True, methods=['POST'],
             permission_classes=[IsAuthenticated, ])
     def favorite(self, request, pk):
@@ -61,6 +142,17 @@ class RecipeViewSet(LikeRecipeMixin, viewsets.ModelViewSet):
         self.unlike(request, pk, Favorite)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['POST'], url_path='favorite',
+            url_name='favorite-bulk', permission_classes=[IsAuthenticated, ])
+    def favorite_bulk(self, request):
+        data = self.like_many(request, Favorite)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @favorite_bulk.mapping.delete
+    def delete_favorite_bulk(self, request):
+        self.unlike_many(request, Favorite)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(detail=True, methods=['POST'],
             permission_classes=[IsAuthenticated, ])
     def shopping_cart(self, request, pk):
@@ -72,9 +164,25 @@ class RecipeViewSet(LikeRecipeMixin, viewsets.ModelViewSet):
         self.unlike(request, pk, Shopping)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(detail=False, permission_classes=[IsAuthenticated, ])
+    @action(detail=False, methods=['POST'], url_path='shopping_cart',
+            url_name='shopping_cart-bulk',
+            permission_classes=[IsAuthenticated, ])
+    def shopping_cart_bulk(self, request):
+        data = self.like_many(request, Shopping)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @shopping_cart_bulk.mapping.delete
+    def delete_shopping_cart_bulk(self, request):
+        self.unlike_many(request, Shopping)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, permission_classes=[IsAuthenticated, ],
+            renderer_classes=[ShoppingCartCSVRenderer,
+                              ShoppingCartTXTRenderer,
+                              ShoppingCartPDFRenderer,
+                              ShoppingCartJSONRenderer])
     def download_shopping_cart(self, request):
-        ingredients = list(RecipeIngredient.objects.filter(
+        ingredients = RecipeIngredient.objects.filter(
             recipe__shoppings__owner=self.request.user
         ).values(
             'ingredient__name', 'ingredient__measurement_unit'
@@ -82,24 +190,16 @@ class RecipeViewSet(LikeRecipeMixin, viewsets.ModelViewSet):
             'ingredient__name'
         ).annotate(
             sum_amount=Sum('amount')
-        ))
-        with io.StringIO() as out:
-            csv_writer = csv.writer(
-                out, delimiter=',', lineterminator='\n',
-                quoting=csv.QUOTE_NONNUMERIC)
-            csv_writer.writerow([
-                ' ', ' ', 'СПИСОК ПРОДУКТОВ для ', 'выбранных ', 'рецептов:'
-            ])
-            csv_writer.writerow(['-', '-', '-', '-', '-'])
-            for num, ingredient in enumerate(ingredients, start=1):
-                prod = ingredient['ingredient__name'] + ': '
-                amount = ingredient['sum_amount']
-                unit = ingredient['ingredient__measurement_unit']
-                csv_writer.writerow([num, '. ', prod, amount, unit])
-            contents = out.getvalue()
-        response = Response(contents,
-                            content_type='text/csv',
-                            status=status.HTTP_200_OK)
-        response['Content-Disposition'] = 'attachment; filename="shopping.csv"'
+        ).iterator()
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients),
+            content_type=content_type,
+            status=status.HTTP_200_OK)
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping.{renderer.format}"')
 
         return response
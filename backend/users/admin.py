@@ -16,6 +16,8 @@ class UserAdmin(admin.ModelAdmin):
         'username',
         'first_name',
         'last_name',
+        'recipes_count',
+        'subscribers_count',
     )
     search_fields = ('email', 'username')
     empty_value_display = '-пусто-'
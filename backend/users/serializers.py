@@ -3,6 +3,8 @@ from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 
+from recipes.cache import get_viewer_state
+from recipes.images import rendition_urls
 from recipes.models import Recipe
 
 from .models import Subscribe
@@ -54,18 +56,25 @@ class ProfileSerializer(UserSerializer):
         read_only_fields = [f.name for f in User._meta.get_fields()]
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
+        if not request:
             return False
-        return Subscribe.objects.filter(user=request.user, author=obj).exists()
+        return obj.id in get_viewer_state(request).subscriptions
 
 
 class RecipeSubscribeSerializer(serializers.ModelSerializer):
     """Рецепты для Подписок"""
 
+    image_renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time',)
+
+    def get_image_renditions(self, obj):
+        return rendition_urls(obj, self.context.get('request'))
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -102,23 +111,25 @@ class SubscribeListSerializer(serializers.ModelSerializer):
                   'last_name', 'is_subscribed', 'recipes', 'recipes_count')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
-        if not request or request.user.is_anonymous:
-            return 0
-        return 1 if Subscribe.objects.filter(
-            user=request.user, author=obj).exists() else 0
+        if not request:
+            return False
+        return obj.id in get_viewer_state(request).subscriptions
 
     def get_recipes(self, obj):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
+        recipes = obj.recipes.all()
         recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit is not None:
-            recipes = obj.recipes.all()[:int(recipes_limit)]
-        else:
-            recipes = obj.recipes.all()
+        is_prefetched = 'recipes' in getattr(
+            obj, '_prefetched_objects_cache', {})
+        if recipes_limit is not None and not is_prefetched:
+            recipes = recipes[:int(recipes_limit)]
         return RecipeSubscribeSerializer(
             recipes, many=True, context={'request': request}).data
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
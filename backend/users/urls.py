@@ -1,15 +1,22 @@
 from django.urls import include, path
+from rest_framework.routers import DefaultRouter
 
-from .views import SubscribeListView, SubscribeView
+from .views import (ProfileViewSet, SubscribeBulkView, SubscribeListView,
+                    SubscribeView)
 
 app_name = 'users'
 
+router = DefaultRouter()
+router.register('users', ProfileViewSet)
+
 
 urlpatterns = [
     path('users/<int:id>/subscribe/', SubscribeView.as_view(),
          name='subscribe'),
+    path('users/subscribe/', SubscribeBulkView.as_view(),
+         name='subscribe-bulk'),
     path('users/subscriptions/', SubscribeListView.as_view(),
          name='subscription'),
     path('auth/', include('djoser.urls.authtoken')),
-    path('', include('djoser.urls')),
+    path('', include(router.urls)),
 ]
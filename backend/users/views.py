@@ -1,12 +1,22 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import (BooleanField, F, OuterRef, Prefetch, Subquery,
+                              Value)
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from rest_framework import status
+from djoser.views import UserViewSet
+from rest_framework import serializers, status
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from recipes.cache import bump_viewer_version
+from recipes.feed import invalidate_timeline
+from recipes.mixins import AnonymousCacheMixin
+from recipes.models import Recipe, count_of
 from recipes.paginations import RecipesPageNumberPagination
+from recipes.serializers import BulkIdsSerializer
 
 from .models import Subscribe
 from .serializers import SubscribeListSerializer, SubscribeSerializer
@@ -14,6 +24,10 @@ from .serializers import SubscribeListSerializer, SubscribeSerializer
 User = get_user_model()
 
 
+class ProfileViewSet(AnonymousCacheMixin, UserViewSet):
+    """Пользователи djoser с кэшем ответов для анонимов."""
+
+
 class SubscribeView(APIView):
     permission_classes = [IsAuthenticated, ]
 
@@ -22,15 +36,85 @@ class SubscribeView(APIView):
             data={'user': request.user.id, 'author': id},
             context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            User.objects.filter(id=id).update(
+                subscribers_count=F('subscribers_count') + 1)
+            transaction.on_commit(
+                lambda: bump_viewer_version(request.user.id))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, id):
-        get_object_or_404(
-            Subscribe,
-            user=request.user,
-            author=get_object_or_404(User, id=id)
-        ).delete()
+        author = get_object_or_404(User, id=id)
+        with transaction.atomic():
+            deleted, _ = Subscribe.objects.filter(
+                user=request.user, author=author).delete()
+            if not deleted:
+                raise Http404
+            User.objects.filter(id=id).update(
+                subscribers_count=F('subscribers_count') - deleted)
+            transaction.on_commit(
+                lambda: bump_viewer_version(request.user.id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SubscribeBulkView(APIView):
+    """
+    Подписка на список авторов одним INSERT ... ON CONFLICT DO NOTHING
+    и отписка одним DELETE. При подписке счётчики подписчиков
+    пересчитываются для затронутых авторов одним UPDATE, при отписке -
+    уменьшаются только у авторов заблокированных и удалённых строк.
+    """
+
+    permission_classes = [IsAuthenticated, ]
+
+    def get_ids(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['ids']
+
+    def recount(self, ids):
+        User.objects.filter(pk__in=ids).update(
+            subscribers_count=count_of(Subscribe, 'author'))
+
+    def changed(self, user_id):
+        bump_viewer_version(user_id)
+        invalidate_timeline(user_id)
+
+    def post(self, request):
+        ids = self.get_ids(request)
+        if request.user.id in ids:
+            raise serializers.ValidationError(
+                {'ids': ['Нельзя подписаться на самого себя.']})
+        found = set(User.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True))
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                {'ids': [f'Авторы не найдены: {missing}']})
+        with transaction.atomic():
+            # bulk_create не отправляет сигналы: ленту сбрасываем сами.
+            Subscribe.objects.bulk_create(
+                [Subscribe(user=request.user, author_id=pk) for pk in ids],
+                ignore_conflicts=True)
+            self.recount(ids)
+            transaction.on_commit(lambda: self.changed(request.user.id))
+        return Response({'ids': ids}, status=status.HTTP_201_CREATED)
+
+    def delete(self, request):
+        ids = self.get_ids(request)
+        with transaction.atomic():
+            rows = Subscribe.objects.filter(
+                user=request.user, author_id__in=ids)
+            deleted_ids = list(rows.select_for_update().values_list(
+                'author_id', flat=True))
+            if not deleted_ids:
+                raise serializers.ValidationError(
+                    {'ids': ['Вы не подписаны ни на одного из авторов.']})
+            rows.filter(author_id__in=deleted_ids).delete()
+            User.objects.filter(pk__in=deleted_ids).update(
+                subscribers_count=F('subscribers_count') - 1)
+            transaction.on_commit(lambda: self.changed(request.user.id))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -38,10 +122,37 @@ class SubscribeListView(ListAPIView):
     pagination_class = RecipesPageNumberPagination
     permission_classes = [IsAuthenticated, ]
 
+    def get_recipes_limit(self):
+        try:
+            recipes_limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return None
+        return max(recipes_limit, 0)
+
+    def get_queryset(self):
+        """
+        Авторы из подписок и не более recipes_limit последних Рецептов
+        каждого: страница грузится тремя запросами.
+        """
+        recipes = Recipe.objects.order_by('-id')
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-id').values('id')[:recipes_limit]
+            ))
+        return User.objects.filter(
+            subscribing__user=self.request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes)
+        ).order_by('-id')
+
     def get(self, request):
         serializer = SubscribeListSerializer(
-            self.paginate_queryset(
-                User.objects.filter(subscribing__user=request.user)),
+            self.paginate_queryset(self.get_queryset()),
             context={'request': request},
             many=True
         )